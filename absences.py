@@ -0,0 +1,142 @@
+import argparse
+import sys
+from datetime import date, datetime
+
+import pandas as pd
+
+import aggregats
+import archives
+from pointage_utils import (
+    EMPLOYES_FILE, POINTAGE_FILE, SEUIL_RETARD, load_data, time_to_minutes
+)
+
+ABSENCES_COLUMNS = ["Date", "ID", "Nom", "Prenom", "Service", "Anomalie"]
+ABSENT = "Absent"
+SORTIE_MANQUANTE = "Sortie manquante"
+
+def jours_ouvres(debut, fin, jours_feries=()):
+    """Jours ouvrés (lundi-vendredi) entre deux dates incluses, hors jours fériés"""
+    jours = pd.bdate_range(debut, fin)
+    return jours.difference(pd.DatetimeIndex(pd.to_datetime(list(jours_feries))))
+
+def _agregats_historique(debut, fin):
+    """Agrégats calculés directement depuis l'historique des pointages (les retards ne servent pas ici)"""
+    return aggregats.calculer(archives.lire_historique(POINTAGE_FILE, debut, fin), pd.DataFrame())
+
+def _lire_dates(filename):
+    try:
+        return pd.read_csv(filename, usecols=["Date"], dtype=str)
+    except (OSError, ValueError, pd.errors.EmptyDataError):
+        return pd.DataFrame(columns=["Date"])
+
+def jours_incomplets(agg, debut, fin):
+    """Jours de la période dont les agrégats ne comptent pas tous les pointages de l'historique"""
+    # Seule la colonne Date est lue, et comptée avant conversion : une valeur par jour à convertir
+    dates = archives.lire_historique(POINTAGE_FILE, debut, fin,
+                                     lecteur=_lire_dates)["Date"].value_counts()
+    dates.index = pd.to_datetime(dates.index, errors="coerce")
+    dates = dates[(dates.index >= pd.Timestamp(debut)) & (dates.index <= pd.Timestamp(fin))]
+    comptes = agg.groupby(pd.to_datetime(agg["Date"]))["Pointages"].sum()
+    ecarts = dates.sub(comptes, fill_value=0)
+    return pd.DatetimeIndex(ecarts.index[ecarts != 0]).sort_values()
+
+def index_pointages(debut, fin):
+    """Entrées et sorties par jour et par employé, lues dans les agrégats ; retourne aussi les jours
+    recalculés depuis l'historique parce que leurs agrégats étaient absents ou incomplets"""
+    if not aggregats.existe():
+        agg, recalcules = _agregats_historique(debut, fin), pd.DatetimeIndex([])
+    else:
+        agg = aggregats.charger_periode(debut, fin)
+        # Un pointage écrit sans passer par enregistrer_pointage n'est pas dans les agrégats :
+        # ces jours-là, l'historique fait foi
+        recalcules = jours_incomplets(agg, debut, fin)
+        if len(recalcules):
+            historique = _agregats_historique(debut, fin)
+            agg = pd.concat([agg[~pd.to_datetime(agg["Date"]).isin(recalcules)],
+                             historique[pd.to_datetime(historique["Date"]).isin(recalcules)]], ignore_index=True)
+    # Un employé peut avoir plusieurs lignes par jour s'il a changé de service
+    agg = agg.astype({"ID": int}).assign(Date=pd.to_datetime(agg["Date"]))
+    return agg.groupby(["Date", "ID"])[["Entrees", "Sorties"]].sum(), recalcules
+
+def detecter_absences(debut, fin, employes=None, pointages=None, jours_feries=(), maintenant=None):
+    """Absents et sorties manquantes sur chaque jour ouvré de la période, par opérations d'ensembles
+
+    Les jours recalculés depuis l'historique (agrégats incomplets) sont listés dans attrs["jours_recalcules"]."""
+    maintenant = maintenant or datetime.now()
+    employes = load_data(EMPLOYES_FILE) if employes is None else employes
+    fin = min(fin, maintenant.date())
+    jours = jours_ouvres(debut, fin, jours_feries)
+    if employes.empty or jours.empty:
+        return pd.DataFrame(columns=ABSENCES_COLUMNS)
+    recalcules = pd.DatetimeIndex([])
+    if pointages is None:
+        pointages, recalcules = index_pointages(debut, fin)
+
+    # Employé × jour attendu, puis différence avec les couples qui ont pointé
+    attendus = pd.MultiIndex.from_product([jours, employes["ID"].astype(int)], names=["Date", "ID"])
+    absents = attendus.difference(pointages.index)
+    entrees = pointages[pointages["Entrees"] > 0].index
+    sans_sortie = entrees.difference(pointages[pointages["Sorties"] > 0].index).intersection(attendus)
+
+    anomalies = pd.concat([
+        absents.to_frame(index=False).assign(Anomalie=ABSENT),
+        sans_sortie.to_frame(index=False).assign(Anomalie=SORTIE_MANQUANTE)
+    ], ignore_index=True)
+
+    # Aujourd'hui, on respecte l'horaire de chacun : absent seulement après l'heure d'entrée
+    # (plus le seuil de retard), sortie manquante seulement après l'heure de sortie
+    horaires = employes.assign(
+        ID=employes["ID"].astype(int),
+        Entree_min=time_to_minutes(employes["Heure_Entree"]),
+        Sortie_min=time_to_minutes(employes["Heure_Sortie"])
+    )
+    anomalies = anomalies.merge(horaires, on="ID", how="left")
+    minute = maintenant.hour * 60 + maintenant.minute
+    en_cours = anomalies["Date"] == pd.Timestamp(maintenant.date())
+    trop_tot = ((anomalies["Anomalie"] == ABSENT) & (anomalies["Entree_min"] + SEUIL_RETARD > minute)) | \
+               ((anomalies["Anomalie"] == SORTIE_MANQUANTE) & (anomalies["Sortie_min"] > minute))
+    anomalies = anomalies[~(en_cours & trop_tot)]
+
+    anomalies = anomalies.sort_values(["Date", "Service", "Nom", "Prenom"], kind="stable")
+    anomalies = anomalies.assign(Date=anomalies["Date"].dt.strftime("%Y-%m-%d"))[ABSENCES_COLUMNS].reset_index(drop=True)
+    anomalies.attrs["jours_recalcules"] = list(recalcules.strftime("%Y-%m-%d"))
+    return anomalies
+
+def resume_par_employe(anomalies):
+    """Nombre de jours d'absence et de sorties manquantes par employé"""
+    if anomalies.empty:
+        return pd.DataFrame(columns=["ID", "Nom", "Prenom", "Service", ABSENT, SORTIE_MANQUANTE])
+    resume = pd.crosstab([anomalies["ID"], anomalies["Nom"], anomalies["Prenom"], anomalies["Service"]],
+                         anomalies["Anomalie"])
+    resume = resume.reindex(columns=[ABSENT, SORTIE_MANQUANTE], fill_value=0).reset_index()
+    resume.columns.name = None
+    return resume.sort_values(ABSENT, ascending=False, kind="stable").reset_index(drop=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="Détection des absences et des sorties manquantes sur une période")
+    parser.add_argument("--debut", type=date.fromisoformat, default=date.today(), help="YYYY-MM-DD, aujourd'hui par défaut")
+    parser.add_argument("--fin", type=date.fromisoformat, help="YYYY-MM-DD, date de début par défaut")
+    parser.add_argument("--feries", help="Fichier texte des jours fériés (une date YYYY-MM-DD par ligne)")
+    parser.add_argument("--sortie", help="Fichier CSV où écrire les anomalies")
+    args = parser.parse_args()
+
+    jours_feries = []
+    if args.feries:
+        with open(args.feries, encoding='utf-8') as f:
+            jours_feries = [ligne.strip() for ligne in f if ligne.strip()]
+
+    anomalies = detecter_absences(args.debut, args.fin or args.debut, jours_feries=jours_feries)
+    recalcules = anomalies.attrs.get("jours_recalcules", [])
+    if recalcules:
+        print(f"Agrégats incomplets, recalculés depuis l'historique pour : {', '.join(recalcules)} "
+              f"(python aggregats.py rebuild pour les corriger)", file=sys.stderr)
+    compte = anomalies["Anomalie"].value_counts()
+    print(f"{compte.get(ABSENT, 0)} absences, {compte.get(SORTIE_MANQUANTE, 0)} sorties manquantes "
+          f"du {args.debut} au {args.fin or args.debut}")
+    if args.sortie:
+        anomalies.to_csv(args.sortie, index=False, encoding='utf-8')
+    elif not anomalies.empty:
+        print(anomalies.to_string(index=False))
+
+if __name__ == "__main__":
+    main()
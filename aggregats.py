@@ -0,0 +1,184 @@
+import argparse
+import csv
+import os
+import shutil
+from datetime import timedelta
+
+import pandas as pd
+
+import archives
+from pointage_utils import POINTAGE_FILE, RETARDS_FILE, file_lock, load_data, save_data
+
+# Un fichier d'agrégats par jour : chaque pointage ne met à jour que le fichier de sa date
+AGGREGATS_DIR = "aggregats"
+AGGREGATS_COLUMNS = ["Date", "Service", "ID", "Pointages", "Entrees", "Sorties", "Retards", "Retard_total", "Retard_max"]
+COMPTEURS = ["Pointages", "Entrees", "Sorties", "Retards", "Retard_total"]
+
+def verrou():
+    """Verrou exclusif entre processus (sessions Streamlit, API, scripts) pour les écritures d'agrégats
+
+    Porté par aggregats.lock : les fichiers du jour et le dossier sont remplacés, on ne peut pas les verrouiller."""
+    return file_lock(AGGREGATS_DIR)
+
+def fichier_jour(date_str):
+    return os.path.join(AGGREGATS_DIR, f"{date_str}.csv")
+
+def charger_jour(date_str):
+    """Agrégats d'une journée (DataFrame vide si aucun pointage)"""
+    df = load_data(fichier_jour(date_str))
+    if df.empty:
+        return pd.DataFrame(columns=AGGREGATS_COLUMNS)
+    return df
+
+def charger_periode(debut, fin):
+    """Agrégats de toutes les journées entre deux dates incluses"""
+    jours = []
+    jour = debut
+    while jour <= fin:
+        path = fichier_jour(jour.strftime("%Y-%m-%d"))
+        if os.path.exists(path):
+            jours.append(load_data(path))
+        jour += timedelta(days=1)
+    if not jours:
+        return pd.DataFrame(columns=AGGREGATS_COLUMNS)
+    return pd.concat(jours, ignore_index=True)
+
+def charger_tous():
+    """Agrégats de toutes les journées"""
+    if not existe():
+        return pd.DataFrame(columns=AGGREGATS_COLUMNS)
+    jours = [load_data(os.path.join(AGGREGATS_DIR, f)) for f in sorted(os.listdir(AGGREGATS_DIR)) if f.endswith(".csv")]
+    if not jours:
+        return pd.DataFrame(columns=AGGREGATS_COLUMNS)
+    return pd.concat(jours, ignore_index=True)
+
+def existe():
+    """Indique si au moins une journée d'agrégats est enregistrée"""
+    return os.path.isdir(AGGREGATS_DIR) and any(f.endswith(".csv") for f in os.listdir(AGGREGATS_DIR))
+
+def initialiser():
+    """Calcule les agrégats depuis l'historique s'ils n'existent pas encore
+
+    À appeler avant d'ajouter un pointage à l'historique : le premier pointage, quel que soit
+    le point d'entrée (application, API, script), ne doit pas créer un dossier limité au jour."""
+    if os.path.isdir(AGGREGATS_DIR):
+        return
+    with verrou():
+        _initialiser()
+
+def _initialiser():
+    if not os.path.isdir(AGGREGATS_DIR):
+        _reconstruire(POINTAGE_FILE, RETARDS_FILE)
+
+def ajouter_pointage(id_employe, service, date_str, type_pointage, retard_min=None):
+    """Met à jour les agrégats du jour pour un pointage (et son retard éventuel)"""
+    with verrou():
+        _ajouter_pointage(id_employe, service, date_str, type_pointage, retard_min)
+
+def _ajouter_pointage(id_employe, service, date_str, type_pointage, retard_min):
+    os.makedirs(AGGREGATS_DIR, exist_ok=True)
+    path = fichier_jour(date_str)
+
+    # Lecture et réécriture ligne à ligne : le fichier du jour reste petit (une ligne par employé)
+    lignes = []
+    if os.path.exists(path):
+        with open(path, newline='', encoding='utf-8') as f:
+            lignes = list(csv.DictReader(f))
+
+    cle = (str(id_employe), str(service))
+    ligne = next((l for l in lignes if (l["ID"], l["Service"]) == cle), None)
+    if ligne is None:
+        ligne = dict(zip(AGGREGATS_COLUMNS, [date_str, service, id_employe, 0, 0, 0, 0, 0, 0]))
+        lignes.append(ligne)
+    for col in COMPTEURS + ["Retard_max"]:
+        ligne[col] = int(ligne[col])
+
+    ligne["Pointages"] += 1
+    if type_pointage == "Entrée":
+        ligne["Entrees"] += 1
+    elif type_pointage == "Sortie":
+        ligne["Sorties"] += 1
+    if retard_min is not None:
+        ligne["Retards"] += 1
+        ligne["Retard_total"] += retard_min
+        ligne["Retard_max"] = max(ligne["Retard_max"], retard_min)
+
+    # Remplacement atomique pour que les lecteurs ne voient jamais un fichier à moitié écrit
+    with open(path + ".tmp", 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=AGGREGATS_COLUMNS, lineterminator="\n")
+        writer.writeheader()
+        writer.writerows(lignes)
+    os.replace(path + ".tmp", path)
+
+def calculer(pointages, retards):
+    """Calcule les agrégats par jour, service et employé à partir de l'historique complet"""
+    cles = ["Date", "Service", "ID"]
+    frames = []
+    if not pointages.empty:
+        frames.append(pointages.assign(
+            Pointages=1,
+            Entrees=(pointages["Type"] == "Entrée").astype(int),
+            Sorties=(pointages["Type"] == "Sortie").astype(int)
+        )[cles + ["Pointages", "Entrees", "Sorties"]])
+    if not retards.empty:
+        frames.append(retards.assign(
+            Retards=1,
+            Retard_total=retards["Retard_min"],
+            Retard_max=retards["Retard_min"]
+        )[cles + ["Retards", "Retard_total", "Retard_max"]])
+    if not frames:
+        return pd.DataFrame(columns=AGGREGATS_COLUMNS)
+
+    # Compteurs absents (aucun retard sur la période) : mis à zéro
+    df = pd.concat(frames, ignore_index=True).reindex(columns=cles + COMPTEURS + ["Retard_max"]).fillna(0)
+    agg = df.groupby(cles, as_index=False).agg({c: "sum" for c in COMPTEURS} | {"Retard_max": "max"})
+    return agg[AGGREGATS_COLUMNS].astype({c: int for c in COMPTEURS + ["Retard_max"]})
+
+def reconstruire(pointage_file=POINTAGE_FILE, retards_file=RETARDS_FILE):
+    """Recalcule tous les fichiers d'agrégats depuis l'historique des pointages et des retards (archives comprises)"""
+    with verrou():
+        return _reconstruire(pointage_file, retards_file)
+
+def _reconstruire(pointage_file, retards_file):
+    agg = calculer(archives.lire_historique(pointage_file), archives.lire_historique(retards_file))
+
+    # Écriture dans un dossier temporaire puis remplacement, pour ne jamais exposer un état partiel
+    tmp_dir = AGGREGATS_DIR + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    for date_str, jour in agg.groupby("Date"):
+        save_data(jour, os.path.join(tmp_dir, f"{date_str}.csv"))
+    shutil.rmtree(AGGREGATS_DIR, ignore_errors=True)
+    os.replace(tmp_dir, AGGREGATS_DIR)
+    return agg
+
+def resume_retards(agg):
+    """Nombre, moyenne et maximum des retards à partir des agrégats"""
+    nombre = int(agg["Retards"].sum()) if not agg.empty else 0
+    if nombre == 0:
+        return {"nombre": 0, "moyenne": 0.0, "max": 0}
+    return {
+        "nombre": nombre,
+        "moyenne": agg["Retard_total"].sum() / nombre,
+        "max": int(agg["Retard_max"].max())
+    }
+
+def presence_par_service(agg):
+    """Nombre d'employés présents (au moins une entrée) par service"""
+    if agg.empty:
+        return pd.Series(dtype=int)
+    presents = agg[agg["Entrees"] > 0]
+    return presents.groupby("Service")["ID"].nunique()
+
+def main():
+    parser = argparse.ArgumentParser(description="Agrégats des pointages et retards par jour, service et employé")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("rebuild", help="Recalculer les agrégats depuis pointage.csv et retards.csv")
+    args = parser.parse_args()
+
+    if args.command == "rebuild":
+        agg = reconstruire()
+        print(f"{len(agg)} lignes d'agrégats sur {agg['Date'].nunique()} jours écrites dans {AGGREGATS_DIR}/")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+import argparse
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from aiohttp import web
+
+import aggregats
+from attendance_utils import (
+    EMBEDDING_MODE, FACES_DIR, OFFICIAL_TIMES, RECOGNITION_THRESHOLD, list_face_files, parse_face_filename, record_attendance
+)
+from cache_utils import file_signature
+from pointage_utils import EMPLOYES_FILE, load_data, enregistrer_pointage
+
+TYPES_POINTAGE = ("Entrée", "Sortie")
+STORAGE_WORKERS = 4  # threads partagés pour les accès aux fichiers
+
+class Stockage:
+    """Accès partagés aux fichiers : pool de threads, verrou d'écriture et liste des employés en mémoire"""
+
+    def __init__(self, workers=STORAGE_WORKERS):
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="stockage")
+        # Les écritures (CSV et agrégats du jour) lisent puis modifient des fichiers : une à la fois
+        self.write_lock = threading.Lock()
+        self._employes = None
+        self._employes_signature = None
+        # Statut du jour mis en cache tant que le fichier d'agrégats du jour ne change pas,
+        # quel que soit le processus qui l'a modifié (API, Streamlit, scripts)
+        self._statut = None
+        self._statut_cle = None
+
+    def employes(self):
+        """Liste des employés, relue seulement quand employes.csv change"""
+        signature = file_signature(EMPLOYES_FILE)
+        if self._employes is None or signature != self._employes_signature:
+            self._employes = load_data(EMPLOYES_FILE)
+            self._employes_signature = signature
+        return self._employes
+
+    def pointer(self, id_employe, type_pointage):
+        with self.write_lock:
+            return enregistrer_pointage(id_employe, type_pointage, employes=self.employes())
+
+    def marquer(self, name, service, check_type):
+        with self.write_lock:
+            return record_attendance(name, service, check_type)
+
+    def statut_du_jour(self):
+        """Présence, retards et pointages de chaque employé pour aujourd'hui"""
+        date_str = datetime.now().strftime("%Y-%m-%d")
+        employes = self.employes()
+        cle = (date_str, file_signature(aggregats.fichier_jour(date_str)), self._employes_signature)
+        if self._statut_cle == cle:
+            return self._statut
+        agg = aggregats.charger_jour(date_str).astype({"ID": int})
+
+        statut = employes[["ID", "Nom", "Prenom", "Service"]].merge(
+            agg[["ID", "Entrees", "Sorties", "Retards", "Retard_total"]], on="ID", how="left"
+        ).fillna({"Entrees": 0, "Sorties": 0, "Retards": 0, "Retard_total": 0})
+        statut["Present"] = statut["Entrees"] > 0
+        self._statut_cle = cle
+        self._statut = {
+            "date": date_str,
+            "presents": int(statut["Present"].sum()),
+            "absents": int((~statut["Present"]).sum()),
+            "employes": statut.astype({"Entrees": int, "Sorties": int, "Retards": int, "Retard_total": int})
+                              .to_dict("records")
+        }
+        return self._statut
+
+    async def run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.pool, func, *args)
+
+class Reconnaissance:
+    """Moteur SFace/YuNet d'OpenCV (sans TensorFlow), chargé à la première requête"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.models = None
+        self.gallery = None
+        self.face_files = None
+
+    def identifier(self, image_bytes):
+        import cv2
+        import numpy as np
+        import sface_opencv
+
+        with self.lock:
+            if self.models is None:
+                self.models = sface_opencv.load_models()
+            # Galerie recalculée quand des visages sont ajoutés ou supprimés
+            face_files = tuple(list_face_files())
+            if face_files != self.face_files:
+                self.face_files = face_files
+                self.gallery = sface_opencv.build_gallery(self.models, FACES_DIR, face_files, EMBEDDING_MODE)
+            labels, gallery = self.gallery
+
+        img = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR)
+        if img is None:
+            raise ValueError("Image illisible")
+        face_file, distance = sface_opencv.recognize(self.models, labels, gallery, img, RECOGNITION_THRESHOLD)
+        if face_file is None:
+            return None, None, None
+        name, service = parse_face_filename(face_file)
+        return name, service, distance
+
+# -------------------- Routes ---------------------
+
+routes = web.RouteTableDef()
+
+@routes.post("/pointer")
+async def pointer(request):
+    """Pointage manuel (app.py) : {"id": 3, "type": "Entrée"}"""
+    try:
+        body = await request.json()
+        id_employe = int(body["id"])
+        type_pointage = body.get("type", "Entrée")
+    except (ValueError, KeyError, TypeError):
+        return web.json_response({"erreur": "Corps JSON attendu : {\"id\": int, \"type\": \"Entrée\"|\"Sortie\"}"},
+                                 status=400)
+    if type_pointage not in TYPES_POINTAGE:
+        return web.json_response({"erreur": f"Type inconnu : {type_pointage}"}, status=400)
+
+    stockage = request.app["stockage"]
+    try:
+        pointage = await stockage.run(stockage.pointer, id_employe, type_pointage)
+    except KeyError as e:
+        return web.json_response({"erreur": str(e.args[0])}, status=404)
+    return web.json_response(pointage, status=201)
+
+@routes.post("/reconnaitre")
+async def reconnaitre(request):
+    """Reconnaissance faciale puis pointage (app1.py) : image JPEG/PNG dans le corps, ?type=Arrivée|Départ"""
+    check_type = request.query.get("type", "Arrivée")
+    if check_type not in OFFICIAL_TIMES:
+        return web.json_response({"erreur": f"Type inconnu : {check_type}"}, status=400)
+    image_bytes = await request.read()
+    if not image_bytes:
+        return web.json_response({"erreur": "Image manquante"}, status=400)
+
+    stockage = request.app["stockage"]
+    try:
+        name, service, distance = await stockage.run(request.app["reconnaissance"].identifier, image_bytes)
+    except ValueError as e:
+        return web.json_response({"erreur": str(e)}, status=400)
+    except OSError as e:
+        # Modèles ONNX absents et non téléchargeables
+        return web.json_response({"erreur": f"Moteur de reconnaissance indisponible : {e}"}, status=503)
+    if name is None:
+        return web.json_response({"erreur": "Visage non reconnu"}, status=404)
+
+    status = await stockage.run(stockage.marquer, name, service, check_type)
+    return web.json_response({"nom": name, "service": service, "distance": distance,
+                              "type": check_type, "statut": status}, status=201)
+
+@routes.get("/aujourdhui")
+async def aujourdhui(request):
+    """Statut du jour de chaque employé, lu dans les agrégats"""
+    stockage = request.app["stockage"]
+    return web.json_response(await stockage.run(stockage.statut_du_jour))
+
+def create_app(workers=STORAGE_WORKERS):
+    app = web.Application(client_max_size=10 * 1024 * 1024)
+    app["stockage"] = Stockage(workers)
+    app["reconnaissance"] = Reconnaissance()
+    app.add_routes(routes)
+
+    async def fermer(app):
+        app["stockage"].pool.shutdown(wait=True)
+    app.on_cleanup.append(fermer)
+    return app
+
+def main():
+    parser = argparse.ArgumentParser(description="API HTTP de pointage pour les bornes")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=STORAGE_WORKERS, help="Threads d'accès aux fichiers")
+    args = parser.parse_args()
+    web.run_app(create_app(args.workers), host=args.host, port=args.port)
+
+if __name__ == "__main__":
+    main()
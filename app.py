@@ -1,8 +1,17 @@
 import streamlit as st
 import pandas as pd
-from datetime import datetime, time, timedelta
+from datetime import datetime, timedelta
 import os
 import csv
+from pointage_utils import (
+    EMPLOYES_FILE, POINTAGE_FILE, RETARDS_FILE, EMPLOYES_COLUMNS, POINTAGE_COLUMNS, RETARDS_COLUMNS,
+    HEURE_ENTREE_DEFAUT, HEURE_SORTIE_DEFAUT, load_data, save_data, str_to_time, enregistrer_pointage, load_typed, to_display
+)
+import absences
+import aggregats
+import archives
+from cache_utils import load_cached, cache_stats
+import import_employes
 
 # Configuration de la page
 st.set_page_config(
@@ -11,16 +20,6 @@ st.set_page_config(
     initial_sidebar_state="auto"
 )
 
-# Chemins des fichiers
-EMPLOYES_FILE = "employes.csv"
-POINTAGE_FILE = "pointage.csv"
-RETARDS_FILE = "retards.csv"
-
-# Heures par défaut
-HEURE_ENTREE_DEFAUT = time(8, 0)  # 8h00
-HEURE_SORTIE_DEFAUT = time(17, 0)  # 17h00
-SEUIL_RETARD = 15  # minutes
-
 # Services disponibles
 SERVICES_DISPONIBLES = [
     "Administration",
@@ -42,37 +41,22 @@ def init_files():
     if not os.path.exists(EMPLOYES_FILE):
         with open(EMPLOYES_FILE, 'w', newline='', encoding='utf-8') as f:
             writer = csv.writer(f)
-            writer.writerow(["ID", "Nom", "Prenom", "Service", "Heure_Entree", "Heure_Sortie"])
+            writer.writerow(EMPLOYES_COLUMNS)
     
     # Fichier de pointage
     if not os.path.exists(POINTAGE_FILE):
         with open(POINTAGE_FILE, 'w', newline='', encoding='utf-8') as f:
             writer = csv.writer(f)
-            writer.writerow(["ID", "Nom", "Prenom", "Service", "Type", "Heure", "Date"])
+            writer.writerow(POINTAGE_COLUMNS)
     
     # Fichier des retards
     if not os.path.exists(RETARDS_FILE):
         with open(RETARDS_FILE, 'w', newline='', encoding='utf-8') as f:
             writer = csv.writer(f)
-            writer.writerow(["ID", "Nom", "Prenom", "Service", "Heure_Arrivee", "Heure_Officielle", "Retard_min", "Date"])
-
-# Charger les données
-def load_data(filename):
-    try:
-        return pd.read_csv(filename)
-    except:
-        return pd.DataFrame()
-
-# Sauvegarder les données
-def save_data(df, filename):
-    df.to_csv(filename, index=False, encoding='utf-8')
-
-# Convertir string en time
-def str_to_time(time_str):
-    try:
-        return datetime.strptime(time_str, "%H:%M").time()
-    except:
-        return HEURE_ENTREE_DEFAUT
+            writer.writerow(RETARDS_COLUMNS)
+    
+    # Agrégats des tableaux de bord, recalculés une fois depuis l'historique existant
+    aggregats.initialiser()
 
 # Fonctions de gestion du personnel
 def ajouter_employe(nom, prenom, service, heure_entree=None, heure_sortie=None):
@@ -115,50 +99,50 @@ def supprimer_employe(id_employe):
 
 # Fonctions de pointage
 def pointer(id_employe, type_pointage):
-    employes = load_data(EMPLOYES_FILE)
-    employe = employes[employes["ID"] == id_employe].iloc[0]
-    
-    now = datetime.now()
-    heure_actuelle = now.time()
-    date_actuelle = now.date()
-    
-    # Enregistrement du pointage
-    df_pointage = load_data(POINTAGE_FILE)
-    new_pointage = pd.DataFrame([[id_employe, employe["Nom"], employe["Prenom"], employe["Service"], type_pointage, heure_actuelle.strftime("%H:%M"), date_actuelle.strftime("%Y-%m-%d")]],
-                            columns=["ID", "Nom", "Prenom", "Service", "Type", "Heure", "Date"])
-    df_pointage = pd.concat([df_pointage, new_pointage], ignore_index=True)
-    save_data(df_pointage, POINTAGE_FILE)
-    
-    # Vérification des retards pour l'arrivée
-    if type_pointage == "Entrée":
-        heure_officielle = str_to_time(employe["Heure_Entree"])
-        retard = (datetime.combine(date_actuelle, heure_actuelle) - 
-                datetime.combine(date_actuelle, heure_officielle)).total_seconds() / 60
-        
-        if retard > SEUIL_RETARD:
-            df_retards = load_data(RETARDS_FILE)
-            new_retard = pd.DataFrame([[id_employe, employe["Nom"], employe["Prenom"], employe["Service"], 
-                                    heure_actuelle.strftime("%H:%M"), heure_officielle.strftime("%H:%M"), round(retard), date_actuelle.strftime("%Y-%m-%d")]],
-                                  columns=["ID", "Nom", "Prenom", "Service", "Heure_Arrivee", "Heure_Officielle", "Retard_min", "Date"])
-            df_retards = pd.concat([df_retards, new_retard], ignore_index=True)
-            save_data(df_retards, RETARDS_FILE)
-            st.warning(f"Retard enregistré: {round(retard)} minutes")
+    pointage = enregistrer_pointage(id_employe, type_pointage)
+    if pointage["Retard_min"] is not None:
+        st.warning(f"Retard enregistré: {pointage['Retard_min']} minutes")
 
 # Calculer les heures travaillées
 def calculer_heures_travaillees(id_employe, date):
-    pointages = load_data(POINTAGE_FILE)
-    pointages_date = pointages[(pointages["ID"] == id_employe) & (pointages["Date"] == date.strftime("%Y-%m-%d"))]
+    pointages = archives.lire_historique(POINTAGE_FILE, date, date,
+                                         lecteur=lambda f: load_cached(f, load_typed, ("ID", "Type", "Heure", "Date")))
+    pointages_date = pointages[(pointages["ID"] == id_employe) & (pointages["Date"] == pd.Timestamp(date))]
     
-    entrees = pointages_date[pointages_date["Type"] == "Entrée"]["Heure"].sort_values()
-    sorties = pointages_date[pointages_date["Type"] == "Sortie"]["Heure"].sort_values()
+    entrees = pointages_date.loc[pointages_date["Type"] == "Entrée", "Heure"]
+    sorties = pointages_date.loc[pointages_date["Type"] == "Sortie", "Heure"]
     
     if len(entrees) == 0 or len(sorties) == 0:
         return timedelta(0)
     
-    premiere_entree = str_to_time(entrees.iloc[0])
-    derniere_sortie = str_to_time(sorties.iloc[-1])
-    
-    return datetime.combine(date, derniere_sortie) - datetime.combine(date, premiere_entree)
+    # Heures en minutes depuis minuit : première entrée et dernière sortie sans conversion
+    return timedelta(minutes=int(sorties.max()) - int(entrees.min()))
+
+def formulaire_import():
+    """Import d'un fichier CSV/Excel d'employés avec rapport d'erreurs par ligne"""
+    st.caption("Colonnes : Nom, Prenom, Service (voir services.csv), et optionnellement Heure_Entree, Heure_Sortie (HH:MM) et Photo")
+    with st.form("import_form"):
+        fichier = st.file_uploader("Fichier des employés", type=["csv", "xlsx"])
+        photos_dir = st.text_input("Dossier des photos sur le serveur (optionnel)")
+        
+        if st.form_submit_button("Importer", use_container_width=True):
+            if fichier is None:
+                st.error("Veuillez choisir un fichier")
+                return
+            if photos_dir and not os.path.isdir(photos_dir):
+                st.error(f"Dossier introuvable : {photos_dir}")
+                return
+            try:
+                ajoutes, erreurs = import_employes.importer_employes(fichier, fichier.name, photos_dir or None)
+            except ValueError as e:
+                st.error(str(e))
+                return
+            
+            if len(ajoutes) > 0:
+                st.success(f"{len(ajoutes)} employés importés avec succès!")
+            if not erreurs.empty:
+                st.warning(f"{len(erreurs)} erreurs détectées")
+                st.dataframe(erreurs, use_container_width=True, hide_index=True)
 
 # Interface Streamlit adaptative
 def main():
@@ -177,14 +161,14 @@ def main():
     
     # Menu adaptatif
     if is_mobile():
-        menu = st.selectbox("Menu", ["Pointage", "Gestion du Personnel", "Historique", "Retards", "Statistiques"])
+        menu = st.selectbox("Menu", ["Pointage", "Gestion du Personnel", "Historique", "Retards", "Absences", "Statistiques"])
     else:
-        menu = st.sidebar.selectbox("Menu", ["Pointage", "Gestion du Personnel", "Historique", "Retards", "Statistiques"])
+        menu = st.sidebar.selectbox("Menu", ["Pointage", "Gestion du Personnel", "Historique", "Retards", "Absences", "Statistiques"])
     
     if menu == "Pointage":
         st.header("Enregistrement des pointages")
         
-        employes = load_data(EMPLOYES_FILE)
+        employes = load_cached(EMPLOYES_FILE, load_data)
         if employes.empty:
             st.warning("Aucun employé enregistré. Veuillez ajouter des employés d'abord.")
             return
@@ -223,7 +207,7 @@ def main():
                     pointer(selected_id, "Sortie")
         
         st.subheader("Derniers pointages")
-        pointages = load_data(POINTAGE_FILE)
+        pointages = load_cached(POINTAGE_FILE, load_data)
         if not pointages.empty:
             st.dataframe(pointages.tail(5).sort_index(ascending=False), use_container_width=True)
     
@@ -232,9 +216,9 @@ def main():
         
         # Onglets adaptés au mobile
         if is_mobile():
-            tab = st.radio("Options", ["Ajouter Employé", "Modifier Employé", "Supprimer Employé"])
+            tab = st.radio("Options", ["Ajouter Employé", "Modifier Employé", "Supprimer Employé", "Import en masse"])
         else:
-            tab1, tab2, tab3 = st.tabs(["Ajouter Employé", "Modifier Employé", "Supprimer Employé"])
+            tab1, tab2, tab3, tab4 = st.tabs(["Ajouter Employé", "Modifier Employé", "Supprimer Employé", "Import en masse"])
         
         if not is_mobile() or tab == "Ajouter Employé":
             if not is_mobile():
@@ -274,7 +258,7 @@ def main():
                             st.error("Veuillez remplir tous les champs")
         
         if not is_mobile() or tab == "Modifier Employé":
-            employes = load_data(EMPLOYES_FILE)
+            employes = load_cached(EMPLOYES_FILE, load_data)
             if employes.empty:
                 st.warning("Aucun employé à modifier")
             else:
@@ -333,7 +317,7 @@ def main():
                                            new_heure_entree, new_heure_sortie)
         
         if not is_mobile() or tab == "Supprimer Employé":
-            employes = load_data(EMPLOYES_FILE)
+            employes = load_cached(EMPLOYES_FILE, load_data)
             if employes.empty:
                 st.warning("Aucun employé à supprimer")
             else:
@@ -350,14 +334,21 @@ def main():
                         selected_id = employes[(employes["Prenom"] + " " + employes["Nom"]) == to_delete]["ID"].iloc[0]
                         supprimer_employe(selected_id)
         
+        if not is_mobile() or tab == "Import en masse":
+            if not is_mobile():
+                with tab4:
+                    formulaire_import()
+            else:
+                formulaire_import()
+        
         st.subheader("Liste des Employés")
-        employes = load_data(EMPLOYES_FILE)
+        employes = load_cached(EMPLOYES_FILE, load_data)
         st.dataframe(employes, use_container_width=True)
     
     elif menu == "Historique":
         st.header("Historique des Pointages")
         
-        employes = load_data(EMPLOYES_FILE)
+        employes = load_cached(EMPLOYES_FILE, load_data)
         
         if is_mobile():
             selected_service = st.selectbox("Filtrer par service", ["Tous"] + SERVICES_DISPONIBLES)
@@ -369,21 +360,23 @@ def main():
             with col2:
                 date_filter = st.date_input("Filtrer par date")
         
-        pointages = load_data(POINTAGE_FILE)
+        # Mois clos lus dans les archives seulement si la date filtrée y remonte
+        pointages = archives.lire_historique(POINTAGE_FILE, date_filter, date_filter, lecteur=lambda f: load_cached(f, load_typed))
         if not pointages.empty:
             if selected_service != "Tous":
                 pointages = pointages[pointages["Service"] == selected_service]
             if date_filter:
-                pointages = pointages[pointages["Date"] == date_filter.strftime("%Y-%m-%d")]
+                pointages = pointages[pointages["Date"] == pd.Timestamp(date_filter)]
             
-            st.dataframe(pointages.sort_values(by=["Date", "Heure"], ascending=False), use_container_width=True)
+            # Tri sur les colonnes typées, conversion en texte seulement pour les lignes affichées
+            st.dataframe(to_display(pointages.sort_values(by=["Date", "Heure"], ascending=False)), use_container_width=True)
         else:
             st.warning("Aucun pointage enregistré")
     
     elif menu == "Retards":
         st.header("Historique des Retards")
         
-        employes = load_data(EMPLOYES_FILE)
+        employes = load_cached(EMPLOYES_FILE, load_data)
         
         if is_mobile():
             selected_service = st.selectbox("Filtrer les retards par service", ["Tous"] + SERVICES_DISPONIBLES)
@@ -395,49 +388,95 @@ def main():
             with col2:
                 date_filter = st.date_input("Filtrer les retards par date")
         
-        retards = load_data(RETARDS_FILE)
+        retards = archives.lire_historique(RETARDS_FILE, date_filter, date_filter, lecteur=lambda f: load_cached(f, load_typed))
         if not retards.empty:
             if selected_service != "Tous":
                 retards = retards[retards["Service"] == selected_service]
             if date_filter:
-                retards = retards[retards["Date"] == date_filter.strftime("%Y-%m-%d")]
+                retards = retards[retards["Date"] == pd.Timestamp(date_filter)]
             
-            st.dataframe(retards.sort_values(by=["Date", "Heure_Arrivee"], ascending=False), use_container_width=True)
+            st.dataframe(to_display(retards.sort_values(by=["Date", "Heure_Arrivee"], ascending=False)), use_container_width=True)
             
-            # Statistiques
+            # Statistiques, lues dans les agrégats plutôt que recalculées sur l'historique
             st.subheader("Statistiques des Retards")
+            if date_filter:
+                agg = aggregats.charger_jour(date_filter.strftime("%Y-%m-%d"))
+            else:
+                agg = aggregats.charger_tous()
+            if selected_service != "Tous":
+                agg = agg[agg["Service"] == selected_service]
+            resume = aggregats.resume_retards(agg)
+            
             if is_mobile():
-                st.metric("Nombre total de retards", len(retards))
-                avg_retard = retards["Retard_min"].mean()
-                st.metric("Retard moyen (min)", round(avg_retard, 1))
-                max_retard = retards["Retard_min"].max()
-                st.metric("Retard maximum (min)", max_retard)
+                st.metric("Nombre total de retards", resume["nombre"])
+                st.metric("Retard moyen (min)", round(resume["moyenne"], 1))
+                st.metric("Retard maximum (min)", resume["max"])
             else:
                 cols = st.columns(3)
                 with cols[0]:
-                    st.metric("Nombre total de retards", len(retards))
+                    st.metric("Nombre total de retards", resume["nombre"])
                 with cols[1]:
-                    avg_retard = retards["Retard_min"].mean()
-                    st.metric("Retard moyen (min)", round(avg_retard, 1))
+                    st.metric("Retard moyen (min)", round(resume["moyenne"], 1))
                 with cols[2]:
-                    max_retard = retards["Retard_min"].max()
-                    st.metric("Retard maximum (min)", max_retard)
+                    st.metric("Retard maximum (min)", resume["max"])
         else:
             st.info("Aucun retard enregistré")
     
+    elif menu == "Absences":
+        st.header("Absences et sorties manquantes")
+        
+        if is_mobile():
+            selected_service = st.selectbox("Filtrer les absences par service", ["Tous"] + SERVICES_DISPONIBLES)
+            periode = st.date_input("Période", (datetime.now().date(), datetime.now().date()))
+        else:
+            col1, col2 = st.columns(2)
+            with col1:
+                selected_service = st.selectbox("Filtrer les absences par service", ["Tous"] + SERVICES_DISPONIBLES)
+            with col2:
+                periode = st.date_input("Période", (datetime.now().date(), datetime.now().date()))
+        
+        # Champ vidé : aucune date ; période en cours de sélection : une seule date
+        if len(periode) == 0:
+            st.info("Choisissez une période")
+            return
+        debut, fin = periode if len(periode) == 2 else (periode[0], periode[0])
+        anomalies = absences.detecter_absences(debut, fin)
+        recalcules = anomalies.attrs.get("jours_recalcules", [])
+        if recalcules:
+            st.warning(f"Agrégats incomplets pour {len(recalcules)} jour(s) ({', '.join(recalcules[:5])}"
+                       f"{'...' if len(recalcules) > 5 else ''}) : ces jours sont recalculés depuis l'historique. "
+                       "Lancer `python aggregats.py rebuild` pour corriger les agrégats.")
+        if selected_service != "Tous":
+            anomalies = anomalies[anomalies["Service"] == selected_service]
+        
+        if anomalies.empty:
+            st.success("Aucune absence ni sortie manquante sur la période")
+        else:
+            compte = anomalies["Anomalie"].value_counts()
+            cols = st.columns(2)
+            with cols[0]:
+                st.metric("Absences", compte.get(absences.ABSENT, 0))
+            with cols[1]:
+                st.metric("Sorties manquantes", compte.get(absences.SORTIE_MANQUANTE, 0))
+            
+            st.subheader("Par employé")
+            st.dataframe(absences.resume_par_employe(anomalies), use_container_width=True, hide_index=True)
+            st.subheader("Détail")
+            st.dataframe(anomalies, use_container_width=True, hide_index=True)
+            st.download_button("Télécharger (CSV)", anomalies.to_csv(index=False).encode('utf-8'),
+                               file_name=f"absences_{debut}_{fin}.csv", mime="text/csv")
+    
     elif menu == "Statistiques":
         st.header("Statistiques des Employés")
         
-        employes = load_data(EMPLOYES_FILE)
-        pointages = load_data(POINTAGE_FILE)
-        retards = load_data(RETARDS_FILE)
+        employes = load_cached(EMPLOYES_FILE, load_data)
         
         if not employes.empty:
             st.subheader("Répartition par service")
             service_counts = employes["Service"].value_counts()
             st.bar_chart(service_counts)
             
-            if not pointages.empty:
+            if aggregats.existe():
                 st.subheader("Heures travaillées")
                 if is_mobile():
                     selected_emp = st.selectbox("Sélectionner un employé", 
@@ -452,6 +491,16 @@ def main():
                 
                 heures = calculer_heures_travaillees(selected_id, selected_date)
                 st.metric("Heures travaillées ce jour", f"{heures.seconds//3600}h{(heures.seconds//60)%60}m")
+                
+                st.subheader("Présence par service")
+                presence = aggregats.presence_par_service(aggregats.charger_jour(selected_date.strftime("%Y-%m-%d")))
+                if presence.empty:
+                    st.info("Aucune entrée enregistrée ce jour")
+                else:
+                    st.bar_chart(presence)
+        
+        with st.expander("Caches de l'application"):
+            st.dataframe(cache_stats(), use_container_width=True, hide_index=True)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,182 +1,154 @@
 import streamlit as st
 import os
 import numpy as np
-from datetime import datetime, time as dt_time
 import pandas as pd
-from deepface import DeepFace
-from PIL import Image
-import cv2
 import time
+from types import SimpleNamespace
 from concurrent.futures import ThreadPoolExecutor
 import hashlib
-
-# Configuration des dossiers
-DATA_DIR = "database"
-FACES_DIR = os.path.join(DATA_DIR, "faces")
-ATTENDANCE_FILE = os.path.join(DATA_DIR, "attendance.csv")
-LATE_ATTENDANCE_FILE = os.path.join(DATA_DIR, "late_attendance.csv")
+import archives
+from cache_utils import DATA_CACHE, EMBEDDING_CACHE, IMAGE_CACHE, file_signature, load_cached, cache_stats
+from attendance_utils import (
+    FACES_DIR, ATTENDANCE_FILE, LATE_ATTENDANCE_FILE, ATTENDANCE_COLUMNS, LATE_ATTENDANCE_COLUMNS,
+    RECOGNITION_THRESHOLD, RECOGNITION_BACKEND, EMBEDDING_MODE, list_face_files, parse_face_filename, record_attendance
+)
 
 # Créer les dossiers si nécessaires
 os.makedirs(FACES_DIR, exist_ok=True)
 if not os.path.exists(ATTENDANCE_FILE):
-    pd.DataFrame(columns=["Nom", "Service", "Date", "Heure", "Type", "Statut"]).to_csv(ATTENDANCE_FILE, index=False)
+    pd.DataFrame(columns=ATTENDANCE_COLUMNS).to_csv(ATTENDANCE_FILE, index=False)
 if not os.path.exists(LATE_ATTENDANCE_FILE):
-    pd.DataFrame(columns=["Nom", "Service", "Date", "Heure Pointage", "Heure Officielle", "Type", "Retard (minutes)"]).to_csv(LATE_ATTENDANCE_FILE, index=False)
+    pd.DataFrame(columns=LATE_ATTENDANCE_COLUMNS).to_csv(LATE_ATTENDANCE_FILE, index=False)
 
-# Configuration
-OFFICIAL_TIMES = {
-    "Arrivée": dt_time(8, 30),
-    "Départ": dt_time(17, 0)
-}
-RECOGNITION_THRESHOLD = 0.3  # Seuil de similarité
-CACHE_EXPIRATION = 3600  # 1 heure en secondes
+# Caches partagés (cache_utils) : bornés en mémoire et invalidés quand le fichier ou le dossier source change
+def get_cached_faces():
+    """Liste des visages enregistrés, relue quand le contenu du dossier change"""
+    return DATA_CACHE.get(
+        "faces",
+        lambda: tuple(list_face_files()),
+        file_signature(FACES_DIR)
+    )
 
-# Cache pour les visages enregistrés
-face_cache = {
-    'last_update': 0,
-    'faces': []
-}
+def get_cached_data(file_path):
+    """Récupère les données avec cache (partagé entre les sessions, ne pas modifier en place)"""
+    return load_cached(file_path, pd.read_csv)
 
-# Cache pour les données de pointage
-data_cache = {
-    'attendance': None,
-    'late_attendance': None,
-    'last_update': 0
-}
+def get_cached_face_image(face_file):
+    """Image décodée d'un visage enregistré, relue si le fichier est modifié"""
+    path = os.path.join(FACES_DIR, face_file)
+    return IMAGE_CACHE.get(path, lambda: load_recognition_stack().cv2.imread(path), file_signature(path))
 
-def get_cached_faces():
-    """Récupère les visages avec cache pour éviter les accès disque fréquents"""
-    current_time = time.time()
-    if current_time - face_cache['last_update'] > CACHE_EXPIRATION or not face_cache['faces']:
-        face_cache['faces'] = [f for f in os.listdir(FACES_DIR) if f.endswith(".jpg")]
-        face_cache['last_update'] = current_time
-    return face_cache['faces']
+@st.cache_resource(show_spinner="Chargement du module de reconnaissance faciale...")
+def load_recognition_stack():
+    """Importe OpenCV, PIL et le moteur de reconnaissance une seule fois par serveur, à la première utilisation"""
+    import cv2
+    from PIL import Image
+
+    if RECOGNITION_BACKEND == "opencv":
+        # SFace/YuNet via le module DNN d'OpenCV, sans TensorFlow
+        import sface_opencv
+        return SimpleNamespace(cv2=cv2, Image=Image, DeepFace=None, models=sface_opencv.load_models())
+
+    from deepface import DeepFace
+
+    # Construire le modèle dès le chargement pour que la première reconnaissance n'en paie pas le coût
+    DeepFace.build_model("SFace")
+    return SimpleNamespace(cv2=cv2, Image=Image, DeepFace=DeepFace, models=None)
+
+def load_face_gallery(face_files):
+    """Embeddings SFace des visages enregistrés, recalculés quand la liste des fichiers change"""
+    import sface_opencv
+
+    def build():
+        with st.spinner("Calcul des embeddings des visages enregistrés..."):
+            return sface_opencv.build_gallery(load_recognition_stack().models, FACES_DIR, face_files, EMBEDDING_MODE)
+    # Une seule galerie en cache, remplacée quand un visage est ajouté, supprimé ou réenregistré
+    signature = tuple((f, file_signature(os.path.join(FACES_DIR, f))) for f in face_files)
+    return EMBEDDING_CACHE.get("gallery", build, signature)
 
-def get_cached_data(file_path, cache_key):
-    """Récupère les données avec cache"""
-    current_time = time.time()
-    if data_cache[cache_key] is None or current_time - data_cache['last_update'] > CACHE_EXPIRATION:
-        data_cache[cache_key] = pd.read_csv(file_path)
-        data_cache['last_update'] = current_time
-    return data_cache[cache_key]
+def to_bgr(image):
+    """Convertit une image PIL (RGB ou RGBA) en tableau BGR pour OpenCV"""
+    cv2 = load_recognition_stack().cv2
+    img_array = np.array(image)
+    if len(img_array.shape) == 3 and img_array.shape[2] == 4:
+        return cv2.cvtColor(img_array, cv2.COLOR_RGBA2BGR)
+    return cv2.cvtColor(img_array, cv2.COLOR_RGB2BGR)
 
 def save_face_image(name, service, image):
     """Optimisée avec compression d'image"""
+    cv2 = load_recognition_stack().cv2
     filename = f"{hashlib.md5((name+service).encode()).hexdigest()}.jpg"
     path = os.path.join(FACES_DIR, filename)
-    
-    img_array = np.array(image)
-    if len(img_array.shape) == 3 and img_array.shape[2] == 4:
-        img_array = cv2.cvtColor(img_array, cv2.COLOR_RGBA2BGR)
-    else:
-        img_array = cv2.cvtColor(img_array, cv2.COLOR_RGB2BGR)
+    img_array = to_bgr(image)
     
     # Compression de l'image pour réduire la taille
     cv2.imwrite(path, img_array, [int(cv2.IMWRITE_JPEG_QUALITY), 80])
     
-    # Mettre à jour le cache
-    face_cache['faces'] = [f for f in os.listdir(FACES_DIR) if f.endswith(".jpg")]
-    face_cache['last_update'] = time.time()
+    # Mettre à jour le cache (remplacer un fichier existant ne modifie pas le dossier) ;
+    # la galerie d'embeddings se recalcule d'elle-même, sa signature suit chaque fichier
+    DATA_CACHE.invalidate("faces")
+    IMAGE_CACHE.invalidate(path)
 
 def recognize_face_parallel(captured_img):
     """Version parallélisée de la reconnaissance faciale"""
-    img_array = np.array(captured_img)
-    if len(img_array.shape) == 3 and img_array.shape[2] == 4:
-        img_array = cv2.cvtColor(img_array, cv2.COLOR_RGBA2BGR)
-    else:
-        img_array = cv2.cvtColor(img_array, cv2.COLOR_RGB2BGR)
-    
-    temp_path = os.path.join(FACES_DIR, f"temp_{int(time.time())}.jpg")
-    cv2.imwrite(temp_path, img_array)
+    stack = load_recognition_stack()
+    # Sonde passée en mémoire à DeepFace : aucun fichier temporaire dans le dossier des visages
+    img_array = to_bgr(captured_img)
     
-    try:
-        def compare_face(face_file):
-            try:
-                db_path = os.path.join(FACES_DIR, face_file)
-                result = DeepFace.verify(
-                    img1_path=temp_path,
-                    img2_path=db_path,
-                    model_name="SFace",
-                    detector_backend="opencv",
-                    enforce_detection=False,
-                    distance_metric="cosine",
-                    silent=True
-                )
-                return result, face_file
-            except Exception:
+    def compare_face(face_file):
+        try:
+            # Image déjà décodée en cache plutôt que relue sur disque à chaque reconnaissance
+            db_img = get_cached_face_image(face_file)
+            if db_img is None:
                 return None, face_file
-        
-        # Utilisation du ThreadPool pour paralléliser les comparaisons
-        with ThreadPoolExecutor(max_workers=4) as executor:
-            results = list(executor.map(compare_face, get_cached_faces()))
-        
-        for result, face_file in results:
-            if result and result["verified"] and result["distance"] < RECOGNITION_THRESHOLD:
-                # Récupérer les infos depuis le nom de fichier
-                name_service = face_file.split('_')
-                if len(name_service) >= 2:
-                    name = name_service[0]
-                    service = ' '.join(name_service[1:]).replace('.jpg', '')
-                    return name, service, result["distance"]
-        
-        return None, None, None
-    finally:
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
-
-def calculate_late_time(check_time, check_type):
-    """Optimisée avec traitement direct du temps"""
-    official_time = OFFICIAL_TIMES[check_type]
-    h, m, s = map(int, check_time.split(':'))
-    check_time_obj = dt_time(h, m, s)
-    
-    if check_type == "Arrivée":
-        if check_time_obj > official_time:
-            return (h - official_time.hour) * 60 + (m - official_time.minute)
-    else:  # Départ
-        if check_time_obj < official_time:
-            return (official_time.hour - h) * 60 + (official_time.minute - m)
-    return 0
-
-def mark_attendance(name, service, check_type):
-    """Optimisée avec écriture unique et mise à jour du cache"""
-    now = datetime.now()
-    date_str = now.strftime("%Y-%m-%d")
-    time_str = now.strftime("%H:%M:%S")
-    
-    late_minutes = calculate_late_time(time_str, check_type)
-    status = "À l'heure" if late_minutes == 0 else f"Retard de {late_minutes} min"
-    
-    # Charger depuis le cache si disponible
-    df = get_cached_data(ATTENDANCE_FILE, 'attendance').copy()
+            result = stack.DeepFace.verify(
+                img1_path=img_array,
+                img2_path=db_img,
+                model_name="SFace",
+                detector_backend="opencv",
+                enforce_detection=False,
+                distance_metric="cosine",
+                silent=True
+            )
+            return result, face_file
+        except Exception:
+            return None, face_file
     
-    new_row = {
-        "Nom": name, "Service": service, "Date": date_str, 
-        "Heure": time_str, "Type": check_type, "Statut": status
-    }
+    # Utilisation du ThreadPool pour paralléliser les comparaisons
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(executor.map(compare_face, get_cached_faces()))
     
-    df = pd.concat([df, pd.DataFrame([new_row])], ignore_index=True)
-    df.to_csv(ATTENDANCE_FILE, index=False)
+    for result, face_file in results:
+        if result and result["verified"] and result["distance"] < RECOGNITION_THRESHOLD:
+            # Récupérer les infos depuis le nom de fichier
+            name, service = parse_face_filename(face_file)
+            if name:
+                return name, service, result["distance"]
     
-    # Mettre à jour le cache
-    data_cache['attendance'] = df
-    data_cache['last_update'] = time.time()
-    
-    if late_minutes > 0:
-        official_time_str = OFFICIAL_TIMES[check_type].strftime("%H:%M:%S")
-        late_df = get_cached_data(LATE_ATTENDANCE_FILE, 'late_attendance').copy()
-        
-        late_row = {
-            "Nom": name, "Service": service, "Date": date_str,
-            "Heure Pointage": time_str, "Heure Officielle": official_time_str,
-            "Type": check_type, "Retard (minutes)": late_minutes
-        }
-        
-        late_df = pd.concat([late_df, pd.DataFrame([late_row])], ignore_index=True)
-        late_df.to_csv(LATE_ATTENDANCE_FILE, index=False)
-        data_cache['late_attendance'] = late_df
-    
-    return status
+    return None, None, None
+
+def recognize_face_opencv(captured_img):
+    """Reconnaissance avec le moteur OpenCV : un seul embedding de la sonde comparé à toute la galerie"""
+    import sface_opencv
+    labels, gallery = load_face_gallery(tuple(get_cached_faces()))
+    face_file, distance = sface_opencv.recognize(
+        load_recognition_stack().models, labels, gallery, to_bgr(captured_img), RECOGNITION_THRESHOLD
+    )
+    if face_file:
+        name, service = parse_face_filename(face_file)
+        if name:
+            return name, service, distance
+    return None, None, None
+
+def recognize_face(captured_img):
+    """Reconnaissance avec le moteur choisi par RECOGNITION_BACKEND"""
+    if RECOGNITION_BACKEND == "opencv":
+        return recognize_face_opencv(captured_img)
+    return recognize_face_parallel(captured_img)
+
+def mark_attendance(name, service, check_type):
+    """Ajout en fin de fichier ; le cache est invalidé par le changement de taille du fichier"""
+    return record_attendance(name, service, check_type)
 
 # -------------------- Interface Streamlit Optimisée ---------------------
 
@@ -225,10 +197,14 @@ if menu == "Accueil":
     with cols[1]:
         st.image("https://img.freepik.com/vecteurs-libre/concept-reconnaissance-faciale_23-2148477110.jpg", 
                 caption="Système de pointage par reconnaissance faciale")
+    
+    with st.expander("Caches de l'application"):
+        st.dataframe(cache_stats(), use_container_width=True, hide_index=True)
 
 # Enregistrement
 elif menu == "Enregistrement":
     st.subheader("👤 Enregistrement d'un nouvel employé")
+    load_recognition_stack()  # chargé uniquement sur les pages qui en ont besoin
     
     with st.form("employee_form"):
         name = st.text_input("Nom complet*")
@@ -245,7 +221,7 @@ elif menu == "Enregistrement":
                 st.error("Veuillez prendre une photo de l'employé")
             else:
                 try:
-                    image = Image.open(img_file)
+                    image = load_recognition_stack().Image.open(img_file)
                     save_face_image(name, service, image)
                     st.success(f"✅ Employé {name} ({service}) enregistré avec succès!")
                     st.image(image, caption="Photo enregistrée", width=300)
@@ -255,6 +231,7 @@ elif menu == "Enregistrement":
 # Pointage
 elif menu == "Pointage":
     st.subheader("📍 Système de pointage")
+    load_recognition_stack()
     check_type = st.radio("Type de pointage", ["Arrivée", "Départ"], horizontal=True)
     
     st.info(f"Prêt pour pointer une {check_type.lower()}. Cliquez sur le bouton ci-dessous.")
@@ -269,9 +246,9 @@ elif menu == "Pointage":
             
             if img_file:
                 try:
-                    image = Image.open(img_file)
+                    image = load_recognition_stack().Image.open(img_file)
                     with st.spinner("Recherche en cours..."):
-                        name, service, distance = recognize_face_parallel(image)
+                        name, service, distance = recognize_face(image)
                         
                         if name:
                             status = mark_attendance(name, service, check_type)
@@ -281,7 +258,7 @@ elif menu == "Pointage":
                                 st.success(f"✅ {check_type} enregistrée pour {name} ({service}) - {status}")
                             
                             # Afficher les derniers pointages
-                            df = get_cached_data(ATTENDANCE_FILE, 'attendance')
+                            df = get_cached_data(ATTENDANCE_FILE)
                             last_records = df[df["Nom"] == name].sort_values(by=["Date", "Heure"], ascending=False).head(3)
                             if not last_records.empty:
                                 st.dataframe(last_records, hide_index=True)
@@ -295,13 +272,15 @@ elif menu == "Pointage":
 # Historique
 elif menu == "Historique":
     st.subheader("📊 Historique des pointages")
-    df = get_cached_data(ATTENDANCE_FILE, 'attendance')
+    df = get_cached_data(ATTENDANCE_FILE)
     
-    if df.empty:
+    if df.empty and not archives.mois_archives(ATTENDANCE_FILE):
         st.info("Aucun pointage enregistré")
     else:
         cols = st.columns(3)
         date_filter = cols[0].date_input("Filtrer par date")
+        # Fichier courant complété par les archives du mois filtré, lus via le cache
+        df = archives.lire_historique(ATTENDANCE_FILE, date_filter, date_filter, lecteur=get_cached_data)
         service_filter = cols[1].selectbox("Filtrer par service", ["Tous"] + list(df["Service"].unique()))
         name_filter = cols[2].selectbox("Filtrer par nom", ["Tous"] + list(df["Nom"].unique()))
         
@@ -320,13 +299,14 @@ elif menu == "Historique":
 # Retards
 elif menu == "Retards":
     st.subheader("⏱️ Historique des retards")
-    late_df = get_cached_data(LATE_ATTENDANCE_FILE, 'late_attendance')
+    late_df = get_cached_data(LATE_ATTENDANCE_FILE)
     
-    if late_df.empty:
+    if late_df.empty and not archives.mois_archives(LATE_ATTENDANCE_FILE):
         st.info("Aucun retard enregistré")
     else:
         cols = st.columns(2)
         date_filter = cols[0].date_input("Filtrer par date", key="late_date")
+        late_df = archives.lire_historique(LATE_ATTENDANCE_FILE, date_filter, date_filter, lecteur=get_cached_data)
         type_filter = cols[1].selectbox("Filtrer par type", ["Tous"] + list(late_df["Type"].unique()))
         
         filtered_df = late_df.copy()
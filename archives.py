@@ -0,0 +1,170 @@
+import argparse
+import glob
+import io
+import json
+import os
+from datetime import date
+
+import pandas as pd
+
+from attendance_utils import ATTENDANCE_FILE, LATE_ATTENDANCE_FILE
+from pointage_utils import POINTAGE_FILE, RETARDS_FILE, file_lock, load_data
+
+# Historique froid : un segment gzip par mois clos, à côté du fichier courant
+# (archives/pointage/2025-06.csv.gz, database/archives/attendance/2025-06.csv.gz)
+ARCHIVES_DIR = "archives"
+JOURNAL_FILE = "compaction.json"  # compaction en cours, pour la reprise après une interruption
+FICHIERS_HISTORIQUE = [POINTAGE_FILE, RETARDS_FILE, ATTENDANCE_FILE, LATE_ATTENDANCE_FILE]
+
+def dossier_archives(filename):
+    stem = os.path.splitext(os.path.basename(filename))[0]
+    return os.path.join(os.path.dirname(filename), ARCHIVES_DIR, stem)
+
+def segments(filename, debut=None, fin=None):
+    """Segments archivés dont le mois est compris entre debut et fin (dates, incluses)"""
+    mois_debut = debut.strftime("%Y-%m") if debut else None
+    mois_fin = fin.strftime("%Y-%m") if fin else None
+    selection = []
+    for path in sorted(glob.glob(os.path.join(dossier_archives(filename), "*.csv.gz"))):
+        mois = os.path.basename(path)[:7]
+        if (mois_debut is None or mois >= mois_debut) and (mois_fin is None or mois <= mois_fin):
+            selection.append(path)
+    return selection
+
+def mois_archives(filename):
+    """Mois disponibles dans les archives d'un fichier"""
+    return sorted({os.path.basename(path)[:7] for path in segments(filename)})
+
+def lire_historique(filename, debut=None, fin=None, lecteur=load_data):
+    """Fichier courant et segments archivés des mois couverts par [debut, fin], dans un seul DataFrame
+
+    Le filtrage par date reste à faire par l'appelant : seuls les mois concernés sont lus."""
+    frames = [lecteur(filename)]
+    frames += [lecteur(path) for path in segments(filename, debut, fin)]
+    non_vides = [df for df in frames if not df.empty]
+    if len(non_vides) <= 1:
+        return non_vides[0] if non_vides else frames[0]
+
+    df = pd.concat(non_vides, ignore_index=True)
+    # Les catégories diffèrent d'un segment à l'autre : on les recalcule après la concaténation
+    for col in non_vides[0].columns:
+        if isinstance(non_vides[0][col].dtype, pd.CategoricalDtype) and col in df.columns:
+            df[col] = df[col].astype("category")
+    return df
+
+def _ecrire_segment(df, dossier, mois):
+    """Écrit un segment en attente (.pending) ; retourne son nom définitif, jamais celui d'un segment existant"""
+    path = os.path.join(dossier, f"{mois}.csv.gz")
+    partie = 1
+    while os.path.exists(path):
+        # Lignes arrivées après l'archivage du mois : segment complémentaire
+        path = os.path.join(dossier, f"{mois}.{partie}.csv.gz")
+        partie += 1
+    df.to_csv(path + ".pending", index=False, encoding='utf-8', compression="gzip", lineterminator="\n")
+    return path
+
+def _publier(path):
+    os.replace(path + ".pending", path)
+    os.chmod(path, 0o444)
+
+def _reprendre(filename):
+    """Termine ou annule une compaction interrompue
+
+    Le remplacement du fichier courant est le point de validation : si le fichier courant
+    est celui préparé par la compaction (même inode), ses segments sont publiés, sinon abandonnés."""
+    dossier = dossier_archives(filename)
+    journal = os.path.join(dossier, JOURNAL_FILE)
+    if os.path.exists(journal):
+        with open(journal, encoding='utf-8') as f:
+            en_cours = json.load(f)
+        valide = os.path.exists(filename) and os.stat(filename).st_ino == en_cours["inode"]
+        for path in en_cours["segments"]:
+            if os.path.exists(path + ".pending"):
+                if valide:
+                    _publier(path)
+                else:
+                    os.remove(path + ".pending")
+        os.remove(journal)
+    # Segments écrits avant l'enregistrement du journal : le fichier courant n'a pas été remplacé
+    for path in glob.glob(os.path.join(dossier, "*.pending")):
+        os.remove(path)
+
+def compacter(filename, avant=None):
+    """Archive les lignes des mois antérieurs à `avant` (mois courant par défaut) ; retourne {mois: lignes}
+
+    Les écritures (append_rows) attendent la fin de la compaction : aucun pointage ne peut être
+    ajouté à l'ancien fichier courant entre sa lecture et son remplacement."""
+    with file_lock(filename):
+        return _compacter(filename, avant)
+
+def _compacter(filename, avant):
+    _reprendre(filename)
+    if not os.path.exists(filename):
+        return {}
+    mois_limite = (avant or date.today()).strftime("%Y-%m")
+
+    # Lecture jusqu'à la dernière ligne complète : une dernière ligne sans fin de ligne
+    # est recopiée telle quelle à la fin du nouveau fichier courant
+    with open(filename, 'rb') as f:
+        contenu = f.read()
+    taille = contenu.rfind(b"\n") + 1
+    if taille == 0:
+        return {}
+    df = pd.read_csv(io.BytesIO(contenu[:taille]), dtype=str, keep_default_na=False)
+    if df.empty or "Date" not in df.columns:
+        return {}
+
+    mois = df["Date"].str[:7]
+    froid = mois.str.match(r"^\d{4}-\d{2}$") & (mois < mois_limite)
+    if not froid.any():
+        return {}
+
+    dossier = dossier_archives(filename)
+    os.makedirs(dossier, exist_ok=True)
+    archives, chemins = {}, []
+    for m, lignes in df[froid].groupby(mois[froid]):
+        chemins.append(_ecrire_segment(lignes, dossier, m))
+        archives[m] = len(lignes)
+
+    # Nouveau fichier courant : mois en cours, plus la dernière ligne incomplète éventuelle
+    tmp = filename + ".tmp"
+    df[~froid].to_csv(tmp, index=False, encoding='utf-8', lineterminator="\n")
+    with open(filename, 'rb') as f, open(tmp, 'ab') as out:
+        f.seek(taille)
+        out.write(f.read())
+
+    # Journal puis remplacement du fichier courant (validation), enfin publication des segments :
+    # une interruption ne laisse jamais les mêmes lignes à la fois dans le fichier courant et les archives
+    journal = os.path.join(dossier, JOURNAL_FILE)
+    with open(journal + ".tmp", 'w', encoding='utf-8') as f:
+        json.dump({"inode": os.stat(tmp).st_ino, "segments": chemins}, f)
+    os.replace(journal + ".tmp", journal)
+    os.replace(tmp, filename)
+    for path in chemins:
+        _publier(path)
+    os.remove(journal)
+    return archives
+
+def main():
+    parser = argparse.ArgumentParser(description="Archivage mensuel de l'historique des pointages")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("compacter", help="Archiver les mois clos")
+    p.add_argument("fichiers", nargs="*", default=FICHIERS_HISTORIQUE)
+    p.add_argument("--avant", help="Archiver les mois antérieurs à ce mois (YYYY-MM), mois courant par défaut")
+    p = sub.add_parser("liste", help="Lister les mois archivés")
+    p.add_argument("fichiers", nargs="*", default=FICHIERS_HISTORIQUE)
+    args = parser.parse_args()
+
+    if args.command == "compacter":
+        avant = date.fromisoformat(args.avant + "-01") if args.avant else None
+        for filename in args.fichiers:
+            archives = compacter(filename, avant)
+            total = sum(archives.values())
+            print(f"{filename} : {total} lignes archivées" +
+                  (f" ({', '.join(f'{m} : {n}' for m, n in archives.items())})" if archives else ""))
+    elif args.command == "liste":
+        for filename in args.fichiers:
+            print(f"{filename} : {', '.join(mois_archives(filename)) or 'aucune archive'}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import os
+from datetime import datetime, time as dt_time
+
+from pointage_utils import append_rows
+
+# Configuration des dossiers
+DATA_DIR = "database"
+FACES_DIR = os.path.join(DATA_DIR, "faces")
+ATTENDANCE_FILE = os.path.join(DATA_DIR, "attendance.csv")
+LATE_ATTENDANCE_FILE = os.path.join(DATA_DIR, "late_attendance.csv")
+
+ATTENDANCE_COLUMNS = ["Nom", "Service", "Date", "Heure", "Type", "Statut"]
+LATE_ATTENDANCE_COLUMNS = ["Nom", "Service", "Date", "Heure Pointage", "Heure Officielle", "Type", "Retard (minutes)"]
+
+# Configuration
+OFFICIAL_TIMES = {
+    "Arrivée": dt_time(8, 30),
+    "Départ": dt_time(17, 0)
+}
+RECOGNITION_THRESHOLD = 0.3  # Seuil de similarité
+# Moteur de reconnaissance : "deepface" (TensorFlow) ou "opencv" (SFace/YuNet via cv2.dnn)
+RECOGNITION_BACKEND = os.environ.get("RECOGNITION_BACKEND", "deepface")
+# Stockage des embeddings du moteur opencv : "float32", "float16" (mémoire / 2) ou "int8" (mémoire / 4),
+# au prix d'une recherche plus lente (voir embedding_quantization.py)
+EMBEDDING_MODE = os.environ.get("EMBEDDING_MODE", "float32")
+
+def list_face_files(faces_dir=FACES_DIR, extensions=(".jpg",)):
+    """Photos des visages enregistrés, triées, sans les sondes temp_<horodatage>.jpg des anciennes versions d'app1.py"""
+    return sorted(f for f in os.listdir(faces_dir) if f.lower().endswith(extensions) and not f.startswith("temp_"))
+
+def parse_face_filename(face_file):
+    """Retourne (nom, service) à partir d'un fichier 'nom_service.jpg', ou (None, None)"""
+    name_service = face_file.split('_')
+    if len(name_service) >= 2:
+        name = name_service[0]
+        service = ' '.join(name_service[1:]).replace('.jpg', '')
+        return name, service
+    return None, None
+
+def calculate_late_time(check_time, check_type):
+    """Optimisée avec traitement direct du temps"""
+    official_time = OFFICIAL_TIMES[check_type]
+    h, m, s = map(int, check_time.split(':'))
+    check_time_obj = dt_time(h, m, s)
+
+    if check_type == "Arrivée":
+        if check_time_obj > official_time:
+            return (h - official_time.hour) * 60 + (m - official_time.minute)
+    else:  # Départ
+        if check_time_obj < official_time:
+            return (official_time.hour - h) * 60 + (official_time.minute - m)
+    return 0
+
+def attendance_status(late_minutes):
+    """Statut affiché dans le fichier de pointage"""
+    return "À l'heure" if late_minutes == 0 else f"Retard de {late_minutes} min"
+
+def record_attendance(name, service, check_type, now=None):
+    """Ajoute le pointage (et le retard éventuel) en fin de fichier ; retourne le statut"""
+    now = now or datetime.now()
+    date_str = now.strftime("%Y-%m-%d")
+    time_str = now.strftime("%H:%M:%S")
+
+    late_minutes = calculate_late_time(time_str, check_type)
+    status = attendance_status(late_minutes)
+
+    new_row = {
+        "Nom": name, "Service": service, "Date": date_str,
+        "Heure": time_str, "Type": check_type, "Statut": status
+    }
+    append_rows([new_row], ATTENDANCE_FILE, ATTENDANCE_COLUMNS)
+
+    if late_minutes > 0:
+        late_row = {
+            "Nom": name, "Service": service, "Date": date_str,
+            "Heure Pointage": time_str, "Heure Officielle": OFFICIAL_TIMES[check_type].strftime("%H:%M:%S"),
+            "Type": check_type, "Retard (minutes)": late_minutes
+        }
+        append_rows([late_row], LATE_ATTENDANCE_FILE, LATE_ATTENDANCE_COLUMNS)
+
+    return status
@@ -0,0 +1,305 @@
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+import cv2
+import numpy as np
+import pandas as pd
+import face_recognition
+
+import archives
+from attendance_utils import (
+    FACES_DIR, ATTENDANCE_FILE, ATTENDANCE_COLUMNS, list_face_files, parse_face_filename, calculate_late_time, attendance_status, record_attendance
+)
+from pointage_utils import EMPLOYES_FILE, POINTAGE_FILE, POINTAGE_COLUMNS, load_data, enregistrer_pointage
+
+# Formats de sortie : colonnes et libellés des types de pointage
+TYPES = {
+    "attendance": ("Arrivée", "Départ"),
+    "pointage": ("Entrée", "Sortie")
+}
+OUTPUT_FILES = {"attendance": ATTENDANCE_FILE, "pointage": POINTAGE_FILE}
+# Un pointage est déjà enregistré si la même personne a le même type de pointage ce jour-là
+DUPLICATE_KEYS = {"attendance": ["Nom", "Date", "Type"], "pointage": ["ID", "Date", "Type"]}
+
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv")
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+TOLERANCE = 0.6  # même seuil que compare_faces (face_utils.py)
+SAMPLE_SECONDS = 1.0  # une image analysée par seconde de vidéo
+RESIZE = 0.5  # réduction des images avant détection
+DEDUP_SECONDS = 120  # passages rapprochés fusionnés en un seul
+
+# Visages connus, chargés une fois par processus
+_known = {'names': [], 'services': [], 'encodings': None}
+
+def load_known_faces(faces_dir=FACES_DIR):
+    """Calcule les encodages des visages enregistrés (nom_service.jpg)"""
+    names, services, encodings = [], [], []
+    for face_file in list_face_files(faces_dir, IMAGE_EXTENSIONS):
+        name, service = parse_face_filename(face_file)
+        if not name:
+            # Même règle que app1.py : un fichier sans « nom_service » ne désigne personne
+            print(f"Nom de fichier sans « nom_service » : {face_file}, ignoré", file=sys.stderr)
+            continue
+
+        img = face_recognition.load_image_file(os.path.join(faces_dir, face_file))
+        encode = face_recognition.face_encodings(img)
+        if len(encode) == 0:
+            print(f"Aucun visage détecté dans {face_file}, ignoré", file=sys.stderr)
+            continue
+        names.append(name)
+        services.append(service)
+        encodings.append(encode[0])
+    return names, services, np.array(encodings)
+
+def _init_worker(names, services, encodings):
+    _known['names'] = names
+    _known['services'] = services
+    _known['encodings'] = encodings
+
+def _match_frame(frame, resize):
+    """Retourne les indices des visages connus présents dans une image BGR"""
+    if resize != 1:
+        frame = cv2.resize(frame, (0, 0), None, resize, resize)
+    rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+    matches = set()
+    locations = face_recognition.face_locations(rgb)
+    if not locations or len(_known['names']) == 0:
+        return matches
+    for encoding in face_recognition.face_encodings(rgb, locations):
+        distances = face_recognition.face_distance(_known['encodings'], encoding)
+        best = int(np.argmin(distances))
+        if distances[best] < TOLERANCE:
+            matches.add(best)
+    return matches
+
+def _process_video_chunk(task):
+    """Analyse les images échantillonnées d'une tranche [début, fin) d'une vidéo"""
+    path, first, last, step, fps, start, resize = task
+    cap = cv2.VideoCapture(path)
+    cap.set(cv2.CAP_PROP_POS_FRAMES, first)
+
+    detections = []
+    sampled = 0
+    for index in range(first, last):
+        if index % step:
+            # grab() avance sans décoder l'image complète
+            if not cap.grab():
+                break
+            continue
+        success, frame = cap.read()
+        if not success:
+            break
+        sampled += 1
+        timestamp = start + timedelta(seconds=index / fps)
+        for best in _match_frame(frame, resize):
+            detections.append((best, timestamp))
+    cap.release()
+    return detections, sampled
+
+def _process_image_chunk(task):
+    """Analyse une liste d'images horodatées par leur date de modification"""
+    paths, resize = task
+    detections = []
+    for path in paths:
+        frame = cv2.imread(path)
+        if frame is None:
+            continue
+        timestamp = datetime.fromtimestamp(os.path.getmtime(path))
+        for best in _match_frame(frame, resize):
+            detections.append((best, timestamp))
+    return detections, len(paths)
+
+def build_tasks(inputs, workers, sample_seconds=SAMPLE_SECONDS, resize=RESIZE, start=None):
+    """Découpe vidéos et dossiers d'images en tranches indépendantes"""
+    video_tasks, image_tasks = [], []
+    duration = 0.0
+
+    for source in inputs:
+        if os.path.isdir(source):
+            images = sorted(
+                os.path.join(source, f) for f in os.listdir(source) if f.lower().endswith(IMAGE_EXTENSIONS)
+            )
+            size = max(1, int(np.ceil(len(images) / (workers * 4))))
+            image_tasks += [(images[i:i + size], resize) for i in range(0, len(images), size)]
+        elif source.lower().endswith(VIDEO_EXTENSIONS):
+            cap = cv2.VideoCapture(source)
+            fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+            n_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            cap.release()
+            if n_frames <= 0:
+                print(f"Vidéo illisible : {source}", file=sys.stderr)
+                continue
+
+            # Sans heure de début explicite, la date de modification marque la fin de l'enregistrement
+            video_start = start or datetime.fromtimestamp(os.path.getmtime(source)) - timedelta(seconds=n_frames / fps)
+            step = max(1, int(round(fps * sample_seconds)))
+            size = int(np.ceil(n_frames / (workers * 2)))
+            size += -size % step  # tranches alignées sur le pas d'échantillonnage
+            video_tasks += [
+                (source, first, min(first + size, n_frames), step, fps, video_start, resize)
+                for first in range(0, n_frames, size)
+            ]
+            duration += n_frames / fps
+        else:
+            print(f"Source ignorée : {source}", file=sys.stderr)
+
+    return video_tasks, image_tasks, duration
+
+def deduplicate(detections, names, services, output_format="attendance", dedup_seconds=DEDUP_SECONDS):
+    """Regroupe les détections en passages puis garde le premier (arrivée) et le dernier (départ) du jour"""
+    if not detections:
+        return pd.DataFrame(columns=["Nom", "Service", "Date", "Heure", "Type"])
+
+    df = pd.DataFrame(detections, columns=["index", "timestamp"]).sort_values(["index", "timestamp"])
+    df["Date"] = df["timestamp"].dt.strftime("%Y-%m-%d")
+
+    # Un nouveau passage commence après dedup_seconds sans détection de la même personne
+    gap = df.groupby(["index", "Date"])["timestamp"].diff()
+    df = df[gap.isna() | (gap > pd.Timedelta(seconds=dedup_seconds))]
+
+    arrival, departure = TYPES[output_format]
+    first = df.groupby(["index", "Date"]).head(1).assign(Type=arrival)
+    last = df.groupby(["index", "Date"]).tail(1)
+    last = last[~last.index.isin(first.index)].assign(Type=departure)
+
+    punches = pd.concat([first, last]).sort_values("timestamp")
+    punches["Nom"] = [names[i] for i in punches["index"]]
+    punches["Service"] = [services[i] for i in punches["index"]]
+    punches["Heure"] = punches["timestamp"].dt.strftime("%H:%M:%S")
+    return punches[["Nom", "Service", "Date", "Heure", "Type"]].reset_index(drop=True)
+
+def to_attendance(punches):
+    """Format de database/attendance.csv (app1.py)"""
+    punches = punches.copy()
+    punches["Statut"] = [
+        attendance_status(calculate_late_time(h, t)) for h, t in zip(punches["Heure"], punches["Type"])
+    ]
+    return punches[ATTENDANCE_COLUMNS]
+
+def to_pointage(punches, employes_file=EMPLOYES_FILE):
+    """Format de pointage.csv (app.py), en retrouvant l'employé par « Prénom Nom » ou « Nom Prénom »
+
+    Un nom porté par plusieurs employés est ambigu : ses pointages sont ignorés plutôt qu'attribués au hasard."""
+    employes = pd.read_csv(employes_file)
+    lookup = {}
+    for _, e in employes.iterrows():
+        for key in (f"{e['Prenom']} {e['Nom']}", f"{e['Nom']} {e['Prenom']}"):
+            lookup.setdefault(" ".join(key.lower().split()), {})[e["ID"]] = e
+
+    rows = []
+    for _, p in punches.iterrows():
+        matches = lookup.get(" ".join(p["Nom"].lower().split()), {})
+        if not matches:
+            print(f"Employé introuvable dans {employes_file} : {p['Nom']}", file=sys.stderr)
+            continue
+        if len(matches) > 1:
+            print(f"Nom ambigu ({len(matches)} employés dans {employes_file}) : {p['Nom']}, pointage ignoré",
+                  file=sys.stderr)
+            continue
+        e = next(iter(matches.values()))
+        rows.append([e["ID"], e["Nom"], e["Prenom"], e["Service"], p["Type"], p["Heure"][:5], p["Date"]])
+    return pd.DataFrame(rows, columns=POINTAGE_COLUMNS)
+
+def drop_existing(punches, output_format="attendance"):
+    """Retire les pointages déjà présents dans le fichier cible (archives comprises), pour pouvoir relancer"""
+    if punches.empty:
+        return punches
+    dates = pd.to_datetime(punches["Date"])
+    existing = archives.lire_historique(OUTPUT_FILES[output_format], dates.min(), dates.max())
+    keys = DUPLICATE_KEYS[output_format]
+    if existing.empty or not set(keys) <= set(existing.columns):
+        return punches
+    known = pd.MultiIndex.from_frame(existing[keys].astype(str))
+    duplicate = pd.MultiIndex.from_frame(punches[keys].astype(str)).isin(known)
+    return punches[~duplicate].reset_index(drop=True)
+
+def record(punches, output_format="attendance"):
+    """Enregistre les pointages par le même chemin que les applications (retards et agrégats compris)"""
+    if output_format == "attendance":
+        for p in punches.itertuples(index=False):
+            now = datetime.strptime(f"{p.Date} {p.Heure}", "%Y-%m-%d %H:%M:%S")
+            record_attendance(p.Nom, p.Service, p.Type, now=now)
+    else:
+        employes = load_data(EMPLOYES_FILE)
+        for p in punches.itertuples(index=False):
+            now = datetime.strptime(f"{p.Date} {p.Heure}", "%Y-%m-%d %H:%M")
+            enregistrer_pointage(int(p.ID), p.Type, employes=employes, now=now)
+
+def run(inputs, output_format="attendance", workers=None, sample_seconds=SAMPLE_SECONDS, resize=RESIZE,
+        start=None, faces_dir=FACES_DIR, dedup_seconds=DEDUP_SECONDS):
+    """Extrait les pointages des sources et retourne (DataFrame, statistiques)"""
+    workers = workers or os.cpu_count() or 1
+    names, services, encodings = load_known_faces(faces_dir)
+    video_tasks, image_tasks, duration = build_tasks(inputs, workers, sample_seconds, resize, start)
+
+    started = time.perf_counter()
+    detections, analysed = [], 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(names, services, encodings)) as executor:
+        results = list(executor.map(_process_video_chunk, video_tasks))
+        results += list(executor.map(_process_image_chunk, image_tasks))
+    for chunk_detections, count in results:
+        detections += chunk_detections
+        analysed += count
+    elapsed = time.perf_counter() - started
+
+    punches = deduplicate(detections, names, services, output_format, dedup_seconds)
+    punches = to_attendance(punches) if output_format == "attendance" else to_pointage(punches)
+    extracted = len(punches)
+    punches = drop_existing(punches, output_format)
+    stats = {
+        "known_faces": len(names),
+        "analysed": analysed,
+        "detections": len(detections),
+        "punches": len(punches),
+        "already_recorded": extracted - len(punches),
+        "elapsed": elapsed,
+        "video_seconds": duration,
+        "realtime_factor": duration / elapsed if elapsed else 0.0
+    }
+    return punches, stats
+
+def main():
+    parser = argparse.ArgumentParser(description="Extraction des pointages depuis des vidéos ou dossiers d'images")
+    parser.add_argument("inputs", nargs="+", help="Fichiers vidéo et/ou dossiers d'images")
+    parser.add_argument("--format", choices=TYPES, default="attendance",
+                        help="attendance : database/attendance.csv (app1.py), pointage : pointage.csv (app.py)")
+    parser.add_argument("--output", help="Exporter les pointages dans ce fichier CSV au lieu de les enregistrer")
+    parser.add_argument("--dry-run", action="store_true", help="Afficher les pointages sans les écrire")
+    parser.add_argument("--workers", type=int, help="Nombre de processus (par défaut : nombre de cœurs)")
+    parser.add_argument("--sample", type=float, default=SAMPLE_SECONDS, help="Secondes entre deux images analysées")
+    parser.add_argument("--resize", type=float, default=RESIZE, help="Facteur de réduction avant détection")
+    parser.add_argument("--dedup", type=int, default=DEDUP_SECONDS, help="Fenêtre de fusion des passages (s)")
+    parser.add_argument("--start", help="Heure de début des vidéos, « AAAA-MM-JJ HH:MM:SS »")
+    parser.add_argument("--faces", default=FACES_DIR, help="Dossier des visages enregistrés")
+    args = parser.parse_args()
+
+    start = datetime.strptime(args.start, "%Y-%m-%d %H:%M:%S") if args.start else None
+    punches, stats = run(args.inputs, args.format, args.workers, args.sample, args.resize,
+                         start, args.faces, args.dedup)
+
+    if args.dry_run:
+        print(punches.to_string(index=False))
+    elif args.output:
+        punches.to_csv(args.output, index=False, encoding='utf-8')
+        print(f"{stats['punches']} pointages exportés dans {args.output}")
+    else:
+        # Même enregistrement qu'un pointage interactif : retards et agrégats du jour mis à jour
+        record(punches, args.format)
+        print(f"{stats['punches']} pointages enregistrés ({args.format})")
+
+    print(f"{stats['known_faces']} visages connus, {stats['analysed']} images analysées, "
+          f"{stats['detections']} détections en {stats['elapsed']:.1f}s, "
+          f"{stats['already_recorded']} pointages déjà enregistrés ignorés", file=sys.stderr)
+    if stats["video_seconds"]:
+        print(f"{stats['video_seconds']:.0f}s de vidéo traitées, {stats['realtime_factor']:.1f}x le temps réel",
+              file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+    try:
+        import psutil
+    except ImportError:
+        psutil = None
+
+from attendance_utils import EMBEDDING_MODE, FACES_DIR, RECOGNITION_THRESHOLD, list_face_files
+
+BACKENDS = ["deepface", "opencv"]
+
+def rss_mb():
+    """Pic de mémoire résidente du processus courant (Mo), None si la mesure n'est pas disponible"""
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss est en octets sous macOS, en kilo-octets sous Linux
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    if psutil is not None:
+        info = psutil.Process().memory_info()
+        # Pic du working set sous Windows
+        return getattr(info, "peak_wset", info.rss) / (1024 * 1024)
+    return None
+
+def run_deepface(face_files, probes):
+    """Même appel que recognize_face_parallel (app1.py) : une vérification par visage enregistré"""
+    started = time.perf_counter()
+    from deepface import DeepFace
+    DeepFace.build_model("SFace")
+    load_s = time.perf_counter() - started
+
+    def compare_face(probe, face_file):
+        try:
+            result = DeepFace.verify(
+                img1_path=probe,
+                img2_path=os.path.join(FACES_DIR, face_file),
+                model_name="SFace",
+                detector_backend="opencv",
+                enforce_detection=False,
+                distance_metric="cosine",
+                silent=True
+            )
+            return result["distance"], face_file
+        except Exception:
+            return None, face_file
+
+    matches, latencies = [], []
+    for probe in probes:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(executor.map(lambda f: compare_face(probe, f), face_files))
+        latencies.append(time.perf_counter() - start)
+        scored = [(d, f) for d, f in results if d is not None]
+        best = min(scored) if scored else (None, None)
+        matches.append(best[1] if best[0] is not None and best[0] < RECOGNITION_THRESHOLD else None)
+    return load_s, 0.0, latencies, matches
+
+def run_opencv(face_files, probes):
+    """Moteur SFace/YuNet d'OpenCV : galerie calculée une fois, un embedding par sonde"""
+    started = time.perf_counter()
+    import cv2
+    import sface_opencv
+    models = sface_opencv.load_models()
+    load_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    labels, gallery = sface_opencv.build_gallery(models, FACES_DIR, face_files, EMBEDDING_MODE)
+    gallery_s = time.perf_counter() - started
+
+    matches, latencies = [], []
+    for probe in probes:
+        start = time.perf_counter()
+        face_file, _ = sface_opencv.recognize(models, labels, gallery, cv2.imread(probe), RECOGNITION_THRESHOLD)
+        latencies.append(time.perf_counter() - start)
+        matches.append(face_file)
+    return load_s, gallery_s, latencies, matches
+
+def worker(backend, probes):
+    """Mesure un moteur dans un processus dédié et écrit le résultat en JSON"""
+    face_files = list_face_files()
+    run = run_opencv if backend == "opencv" else run_deepface
+    load_s, gallery_s, latencies, matches = run(face_files, probes)
+
+    latencies_ms = sorted(l * 1000 for l in latencies)
+    print(json.dumps({
+        "backend": backend,
+        "gallery": len(face_files),
+        "load_s": load_s,
+        "gallery_s": gallery_s,
+        "mean_ms": sum(latencies_ms) / len(latencies_ms),
+        "p95_ms": latencies_ms[min(len(latencies_ms) - 1, int(len(latencies_ms) * 0.95))],
+        "rss_mb": rss_mb(),
+        "matches": matches
+    }))
+
+def main():
+    parser = argparse.ArgumentParser(description="Comparaison des moteurs de reconnaissance DeepFace et OpenCV")
+    parser.add_argument("probes", nargs="*", help="Images de test (par défaut : les visages enregistrés)")
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=BACKENDS)
+    parser.add_argument("--worker", choices=BACKENDS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    probes = args.probes or [os.path.join(FACES_DIR, f) for f in list_face_files()]
+    if args.worker:
+        worker(args.worker, probes)
+        return
+
+    # Un processus par moteur pour que les mesures de mémoire ne se mélangent pas
+    results = []
+    for backend in args.backends:
+        proc = subprocess.run([sys.executable, __file__, "--worker", backend] + probes,
+                              capture_output=True, text=True)
+        if proc.returncode != 0:
+            print(f"Échec du moteur {backend} :\n{proc.stderr[-2000:]}", file=sys.stderr)
+            continue
+        results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+
+    print(f"{len(probes)} sondes, seuil cosinus {RECOGNITION_THRESHOLD}")
+    print(f"{'moteur':<10} {'galerie':>7} {'chargement':>11} {'embeddings':>11} {'moy. (ms)':>10} "
+          f"{'p95 (ms)':>9} {'RSS (Mo)':>9}")
+    for r in results:
+        print(f"{r['backend']:<10} {r['gallery']:>7} {r['load_s']:>10.2f}s {r['gallery_s']:>10.2f}s "
+              f"{r['mean_ms']:>10.1f} {r['p95_ms']:>9.1f} {'n/d' if r['rss_mb'] is None else format(r['rss_mb'], '.0f'):>9}")
+
+    if len(results) == 2:
+        same = sum(a == b for a, b in zip(results[0]["matches"], results[1]["matches"]))
+        print(f"Décisions identiques : {same}/{len(probes)}")
+        for probe, a, b in zip(probes, results[0]["matches"], results[1]["matches"]):
+            if a != b:
+                print(f"  {os.path.basename(probe)} : {results[0]['backend']}={a} {results[1]['backend']}={b}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# Budgets mémoire des caches partagés, en Mo (modifiables par variables d'environnement)
+DATA_CACHE_MB = int(os.environ.get("CACHE_DATA_MB", 256))
+EMBEDDING_CACHE_MB = int(os.environ.get("CACHE_EMBEDDING_MB", 64))
+IMAGE_CACHE_MB = int(os.environ.get("CACHE_IMAGE_MB", 128))
+
+_caches = {}
+
+def size_of(value):
+    """Taille mémoire approximative d'une valeur en octets (DataFrame, tableau numpy, conteneurs)"""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return int(np.sum(value.memory_usage(deep=True)))
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return sys.getsizeof(value) + sum(size_of(v) for v in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(size_of(k) + size_of(v) for k, v in value.items())
+    return sys.getsizeof(value)
+
+def file_signature(path):
+    """(mtime_ns, taille) d'un fichier ou d'un dossier, None s'il n'existe pas"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+class LRUCache:
+    """Cache LRU borné en octets, partagé entre les threads (sessions Streamlit)
+
+    Chaque entrée garde la signature de sa source : une signature différente
+    à la lecture (fichier modifié) provoque un rechargement."""
+
+    def __init__(self, name, max_mb):
+        self.name = name
+        self.max_bytes = max_mb * 1024 * 1024
+        self._entries = OrderedDict()  # clé -> (valeur, taille, signature)
+        self._lock = threading.RLock()
+        self._key_locks = {}
+        self.bytes = 0
+        self.hits = self.misses = self.evictions = self.invalidations = self.rejected = 0
+        _caches[name] = self
+
+    def _lookup(self, key, signature):
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        if entry[2] != signature:
+            self._remove(key)
+            self.invalidations += 1
+            return False, None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return True, entry[0]
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self.bytes -= size
+
+    def get(self, key, loader, signature=None):
+        """Valeur en cache si sa signature est inchangée, sinon loader() mis en cache"""
+        with self._lock:
+            found, value = self._lookup(key, signature)
+            if found:
+                return value
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        # Un seul chargement par clé : les autres sessions attendent puis lisent le cache
+        with key_lock:
+            with self._lock:
+                found, value = self._lookup(key, signature)
+                if found:
+                    return value
+                self.misses += 1
+            try:
+                value = loader()
+                self.put(key, value, signature)
+            finally:
+                # Verrou de chargement libéré avec la clé : les sessions en attente liront l'entrée en cache
+                with self._lock:
+                    if self._key_locks.get(key) is key_lock:
+                        del self._key_locks[key]
+            return value
+
+    def put(self, key, value, signature=None):
+        size = size_of(value)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if size > self.max_bytes:
+                self.rejected += 1
+                return
+            self._entries[key] = (value, size, signature)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, key=None):
+        """Supprime une entrée, ou toutes les entrées si key est None"""
+        with self._lock:
+            if key is None:
+                keys = list(self._entries)
+            else:
+                keys = [key] if key in self._entries else []
+            for k in keys:
+                self._remove(k)
+            self.invalidations += len(keys)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "Cache": self.name,
+                "Entrées": len(self._entries),
+                "Mo": round(self.bytes / 1024 / 1024, 2),
+                "Mo max": round(self.max_bytes / 1024 / 1024, 2),
+                "Hits": self.hits,
+                "Misses": self.misses,
+                "Taux de hits": round(self.hits / total, 3) if total else 0.0,
+                "Évictions": self.evictions,
+                "Invalidations": self.invalidations,
+                "Rejets (trop gros)": self.rejected
+            }
+
+# Caches partagés par tout le processus : le module importé survit aux réexécutions du script Streamlit
+DATA_CACHE = LRUCache("données", DATA_CACHE_MB)
+EMBEDDING_CACHE = LRUCache("embeddings", EMBEDDING_CACHE_MB)
+IMAGE_CACHE = LRUCache("images", IMAGE_CACHE_MB)
+
+def load_cached(filename, loader, *args):
+    """loader(filename, *args) mis en cache jusqu'à la prochaine modification du fichier
+
+    Le DataFrame retourné est partagé entre les sessions : ne pas le modifier en place."""
+    key = (loader.__module__, loader.__name__, filename, args)
+    return DATA_CACHE.get(key, lambda: loader(filename, *args), file_signature(filename))
+
+def cache_stats():
+    """Statistiques de tous les caches (une ligne par cache)"""
+    return pd.DataFrame([cache.stats() for cache in _caches.values()])
@@ -0,0 +1,115 @@
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import aiohttp
+import pandas as pd
+
+from pointage_utils import EMPLOYES_COLUMNS
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def preparer_donnees(dossier, n_employes):
+    """Crée une liste d'employés fictifs dans un dossier de travail isolé"""
+    employes = pd.DataFrame({
+        "ID": range(1, n_employes + 1),
+        "Nom": [f"nom{i}" for i in range(1, n_employes + 1)],
+        "Prenom": "test",
+        "Service": "Production",
+        "Heure_Entree": "08:00",
+        "Heure_Sortie": "17:00"
+    })[EMPLOYES_COLUMNS]
+    employes.to_csv(os.path.join(dossier, "employes.csv"), index=False)
+
+async def attendre_serveur(session, url, timeout=30):
+    debut = time.perf_counter()
+    while time.perf_counter() - debut < timeout:
+        try:
+            async with session.get(f"{url}/aujourdhui") as r:
+                if r.status == 200:
+                    return
+        except aiohttp.ClientError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("Le serveur n'a pas démarré")
+
+async def client(session, url, n_requetes, n_employes, part_lecture, latences, erreurs):
+    """Envoie des requêtes en série : pointages et consultations du statut du jour"""
+    for _ in range(n_requetes):
+        debut = time.perf_counter()
+        try:
+            if random.random() < part_lecture:
+                async with session.get(f"{url}/aujourdhui") as r:
+                    await r.read()
+                    ok = r.status == 200
+            else:
+                body = {"id": random.randint(1, n_employes), "type": random.choice(["Entrée", "Sortie"])}
+                async with session.post(f"{url}/pointer", json=body) as r:
+                    await r.read()
+                    ok = r.status == 201
+        except aiohttp.ClientError:
+            ok = False
+        latences.append(time.perf_counter() - debut)
+        if not ok:
+            erreurs.append(1)
+
+async def charge(url, concurrence, total, n_employes, part_lecture):
+    latences, erreurs = [], []
+    connector = aiohttp.TCPConnector(limit=concurrence)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        await attendre_serveur(session, url)
+        par_client = max(1, total // concurrence)
+        debut = time.perf_counter()
+        await asyncio.gather(*(
+            client(session, url, par_client, n_employes, part_lecture, latences, erreurs)
+            for _ in range(concurrence)
+        ))
+        duree = time.perf_counter() - debut
+    return latences, len(erreurs), duree
+
+def percentile(valeurs, p):
+    valeurs = sorted(valeurs)
+    return valeurs[min(len(valeurs) - 1, int(len(valeurs) * p))]
+
+def main():
+    parser = argparse.ArgumentParser(description="Test de charge de l'API de pointage sur la machine locale")
+    parser.add_argument("--port", type=int, default=8091)
+    parser.add_argument("--concurrence", type=int, default=32, help="Clients simultanés")
+    parser.add_argument("--requetes", type=int, default=5000, help="Nombre total de requêtes")
+    parser.add_argument("--employes", type=int, default=500)
+    parser.add_argument("--lecture", type=float, default=0.2, help="Part des requêtes GET /aujourdhui")
+    args = parser.parse_args()
+
+    # Le serveur tourne dans un dossier temporaire pour ne pas toucher aux vrais fichiers
+    dossier = tempfile.mkdtemp(prefix="charge_api_")
+    preparer_donnees(dossier, args.employes)
+    env = dict(os.environ, PYTHONPATH=REPO_DIR)
+    serveur = subprocess.Popen(
+        [sys.executable, os.path.join(REPO_DIR, "api_pointage.py"), "--host", "127.0.0.1", "--port", str(args.port)],
+        cwd=dossier, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        url = f"http://127.0.0.1:{args.port}"
+        latences, n_erreurs, duree = asyncio.run(
+            charge(url, args.concurrence, args.requetes, args.employes, args.lecture)
+        )
+    finally:
+        serveur.terminate()
+        serveur.wait()
+        lignes = sum(1 for _ in open(os.path.join(dossier, "pointage.csv"))) - 1 \
+            if os.path.exists(os.path.join(dossier, "pointage.csv")) else 0
+        shutil.rmtree(dossier, ignore_errors=True)
+
+    print(f"{len(latences)} requêtes ({args.lecture:.0%} lectures), {args.concurrence} clients, {args.employes} employés")
+    print(f"Débit : {len(latences) / duree:.0f} requêtes/s, erreurs : {n_erreurs}, pointages écrits : {lignes}")
+    print(f"Latence p50 {percentile(latences, 0.50) * 1000:.1f} ms, p95 {percentile(latences, 0.95) * 1000:.1f} ms, "
+          f"p99 {percentile(latences, 0.99) * 1000:.1f} ms, max {max(latences) * 1000:.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+import argparse
+import os
+import pickle
+import time
+
+import numpy as np
+
+# Seuils de décision utilisés par l'application
+RECOGNITION_THRESHOLD = 0.3  # distance cosinus (RECOGNITION_THRESHOLD dans app1.py)
+COMPARE_FACES_THRESHOLD = 0.6  # distance euclidienne (compare_faces dans face_utils.py)
+THRESHOLDS = {
+    "cosine": RECOGNITION_THRESHOLD,
+    "euclidean": COMPARE_FACES_THRESHOLD
+}
+
+# Bases d'embeddings existantes
+GALLERY_FILES = ["employees_db.pkl", "employee_db.pkl", "base_employes.pkl"]
+
+# Modes de stockage de la galerie (EMBEDDING_MODE dans attendance_utils) : float16 et int8 divisent
+# la mémoire par 2 et par 4, mais chaque recherche décompresse les blocs en float32 (_dot) et reste
+# plus lente qu'en float32 ; la commande evaluate mesure ce compromis
+MODES = ("float32", "float16", "int8")
+BLOCK_SIZE = 4096  # lignes décompressées à la fois pendant le calcul des distances
+
+def load_gallery(path):
+    """Charge une base pickle {id: {"name", "embedding", ...}} et retourne (noms, matrice float32)"""
+    with open(path, 'rb') as f:
+        db = pickle.load(f)
+
+    labels = []
+    embeddings = []
+    for key, entry in db.items():
+        embedding = entry.get("embedding")
+        if embedding is None:
+            continue
+        labels.append(entry.get("name", key))
+        embeddings.append(np.asarray(embedding, dtype=np.float32).ravel())
+
+    if not embeddings:
+        return labels, np.empty((0, 0), dtype=np.float32)
+    return labels, np.vstack(embeddings)
+
+def quantize_embeddings(embeddings, mode="float16"):
+    """Convertit une matrice d'embeddings en galerie compacte (float32, float16 ou int8)"""
+    if mode not in MODES:
+        raise ValueError(f"Mode de quantification inconnu : {mode}")
+
+    embeddings = np.atleast_2d(np.asarray(embeddings, dtype=np.float32))
+
+    if mode == "int8":
+        # Quantification symétrique par vecteur : x ≈ q * scale
+        scales = np.abs(embeddings).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        data = np.round(embeddings / scales[:, None]).astype(np.int8)
+        scales = scales.astype(np.float32)
+    else:
+        data = embeddings.astype(mode)
+        scales = None
+
+    gallery = {"mode": mode, "data": data, "scales": scales, "sq_norms": None}
+    # Normes calculées sur les valeurs quantifiées pour rester cohérent avec les produits scalaires
+    gallery["sq_norms"] = _dot(gallery, None)
+    return gallery
+
+def _dot(gallery, probes):
+    """Produits scalaires galerie x sondes, calculés par blocs pour limiter la mémoire temporaire"""
+    data = gallery["data"]
+    n_probes = 1 if probes is None else probes.shape[0]
+    out = np.empty((len(data), n_probes), dtype=np.float32)
+
+    for start in range(0, len(data), BLOCK_SIZE):
+        block = data[start:start + BLOCK_SIZE].astype(np.float32, copy=False)
+        if probes is None:
+            out[start:start + BLOCK_SIZE, 0] = np.einsum("ij,ij->i", block, block)
+        else:
+            out[start:start + BLOCK_SIZE] = block @ probes.T
+
+    if gallery["scales"] is not None:
+        factor = gallery["scales"][:, None]
+        out *= factor * factor if probes is None else factor
+    return out[:, 0] if probes is None else out
+
+def gallery_distances(gallery, probes, metric="cosine"):
+    """Distances entre la galerie et une sonde (1-D) ou plusieurs sondes (2-D)"""
+    single = np.ndim(probes) == 1
+    probes = np.atleast_2d(np.asarray(probes, dtype=np.float32))
+
+    dots = _dot(gallery, probes)
+    g_sq = gallery["sq_norms"][:, None]
+    p_sq = np.einsum("ij,ij->i", probes, probes)[None, :]
+
+    if metric == "cosine":
+        denom = np.sqrt(g_sq * p_sq)
+        denom[denom == 0] = 1.0
+        distances = 1.0 - dots / denom
+    elif metric == "euclidean":
+        distances = np.sqrt(np.maximum(g_sq + p_sq - 2.0 * dots, 0.0))
+    else:
+        raise ValueError(f"Métrique inconnue : {metric}")
+
+    return distances[:, 0] if single else distances
+
+def gallery_nbytes(gallery):
+    """Mémoire occupée par la galerie (données, échelles et normes)"""
+    total = gallery["data"].nbytes + gallery["sq_norms"].nbytes
+    if gallery["scales"] is not None:
+        total += gallery["scales"].nbytes
+    return total
+
+# -------------------- Évaluation de la précision ---------------------
+
+def error_rates(distances, gallery_labels, probe_labels, threshold, valid=None):
+    """Taux de fausses acceptations et de faux rejets pour un seuil donné (None si aucune paire)
+
+    `valid` exclut des paires, par exemple un visage comparé à lui-même."""
+    genuine = np.asarray(gallery_labels)[:, None] == np.asarray(probe_labels)[None, :]
+    accepted = distances < threshold
+    if valid is None:
+        valid = np.ones_like(genuine)
+    impostor = ~genuine & valid
+    genuine = genuine & valid
+
+    n_genuine = genuine.sum()
+    n_impostor = impostor.sum()
+    far = float((accepted & impostor).sum() / n_impostor) if n_impostor else None
+    frr = float((~accepted & genuine).sum() / n_genuine) if n_genuine else None
+    return far, frr
+
+def _delta(value, reference):
+    return value - reference if value is not None and reference is not None else None
+
+def time_search(gallery, probes, metric, batch=False, repeat=5):
+    """Temps moyen (ms) pour comparer une sonde à toute la galerie, une par une ou en lot"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        if batch:
+            gallery_distances(gallery, probes, metric)
+        else:
+            for probe in probes:
+                gallery_distances(gallery, probe, metric)
+        best = min(best, time.perf_counter() - start)
+    return best / len(probes) * 1000
+
+def evaluate(labels, embeddings, probe_labels=None, probes=None, modes=MODES, bench_size=0):
+    """Compare chaque mode de quantification à la référence float32 sur les mêmes essais"""
+    valid = None
+    if probes is None:
+        # Sans jeu de sondes, chaque visage enregistré sert de sonde contre le reste de la galerie :
+        # la comparaison d'un visage avec lui-même (distance nulle) n'est pas un essai
+        probe_labels, probes = labels, embeddings
+        valid = ~np.eye(len(labels), dtype=bool)
+
+    # Galerie synthétique plus grande, utilisée uniquement pour mesurer mémoire et vitesse
+    bench = embeddings
+    if bench_size > len(embeddings):
+        rng = np.random.default_rng(0)
+        reps = int(np.ceil(bench_size / len(embeddings)))
+        bench = np.tile(embeddings, (reps, 1))[:bench_size]
+        bench = bench + rng.normal(0, bench.std() * 0.1, bench.shape).astype(np.float32)
+
+    # Sondes de mesure : 32 lignes de la galerie, traitées une par une puis en un seul lot
+    bench_probes = bench[:32]
+
+    reference = quantize_embeddings(embeddings, "float32")
+    rows = []
+    for mode in modes:
+        gallery = quantize_embeddings(embeddings, mode)
+        bench_gallery = quantize_embeddings(bench, mode)
+        for metric, threshold in THRESHOLDS.items():
+            ref_dist = gallery_distances(reference, probes, metric)
+            dist = gallery_distances(gallery, probes, metric)
+            far, frr = error_rates(dist, labels, probe_labels, threshold, valid)
+            ref_far, ref_frr = error_rates(ref_dist, labels, probe_labels, threshold, valid)
+            changes = (dist < threshold) != (ref_dist < threshold)
+            errors = np.abs(dist - ref_dist)
+            if valid is not None:
+                changes, errors = changes[valid], errors[valid]
+            rows.append({
+                "mode": mode,
+                "metric": metric,
+                "threshold": threshold,
+                "far": far,
+                "frr": frr,
+                "delta_far": _delta(far, ref_far),
+                "delta_frr": _delta(frr, ref_frr),
+                "flips": int(changes.sum()),
+                "max_error": float(errors.max()) if errors.size else 0.0,
+                "bytes": gallery_nbytes(bench_gallery),
+                "ms_per_probe": time_search(bench_gallery, bench_probes, metric),
+                "ms_per_probe_batch": time_search(bench_gallery, bench_probes, metric, batch=True)
+            })
+    return rows, len(bench)
+
+def _rate(value, fmt):
+    """Taux formaté, « n/d » quand aucune paire ne permet de le mesurer"""
+    return "n/d" if value is None else format(value, fmt)
+
+def print_report(rows, gallery_size):
+    """Affiche le rapport d'évaluation sous forme de tableau"""
+    base = {r["metric"]: r for r in rows if r["mode"] == "float32"}
+    print(f"Galerie de mesure : {gallery_size} embeddings")
+    print(f"{'mode':<8} {'métrique':<10} {'seuil':>5} {'FAR':>7} {'FRR':>7} {'ΔFAR':>8} {'ΔFRR':>8} "
+          f"{'inversions':>10} {'err. max':>9} {'mémoire':>10} {'gain':>5} {'ms/sonde':>9} {'accél.':>6} "
+          f"{'ms/lot':>7} {'accél.':>6}")
+    for r in rows:
+        ref = base.get(r["metric"], r)
+        print(f"{r['mode']:<8} {r['metric']:<10} {r['threshold']:>5.2f} {_rate(r['far'], '.2%'):>7} "
+              f"{_rate(r['frr'], '.2%'):>7} {_rate(r['delta_far'], '+.2%'):>8} {_rate(r['delta_frr'], '+.2%'):>8} "
+              f"{r['flips']:>10} {r['max_error']:>9.5f} "
+              f"{r['bytes'] / 1024:>8.1f}Ko {ref['bytes'] / r['bytes']:>4.1f}x "
+              f"{r['ms_per_probe']:>9.3f} {ref['ms_per_probe'] / r['ms_per_probe']:>5.2f}x "
+              f"{r['ms_per_probe_batch']:>7.3f} {ref['ms_per_probe_batch'] / r['ms_per_probe_batch']:>5.2f}x")
+    if rows and rows[0]["frr"] is None:
+        print("FRR non mesurable : une seule photo par personne dans la galerie. "
+              "Fournir --probes avec d'autres photos des mêmes personnes.")
+
+def main():
+    parser = argparse.ArgumentParser(description="Quantification des embeddings faciaux et évaluation de la précision")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_eval = sub.add_parser("evaluate", help="Évaluer FAR/FRR, mémoire et vitesse par mode")
+    p_eval.add_argument("gallery", nargs="?", help="Base pickle des visages enregistrés")
+    p_eval.add_argument("--probes", help="Base pickle de sondes étiquetées (mêmes noms que la galerie)")
+    p_eval.add_argument("--bench-size", type=int, default=10000, help="Taille de la galerie synthétique de mesure")
+
+    args = parser.parse_args()
+
+    path = args.gallery or next((f for f in GALLERY_FILES if os.path.exists(f)), None)
+    if path is None:
+        parser.error("Aucune base d'embeddings trouvée")
+    labels, embeddings = load_gallery(path)
+    if len(labels) == 0:
+        parser.error(f"Aucun embedding dans {path}")
+
+    probe_labels, probes = (None, None)
+    if args.probes:
+        probe_labels, probes = load_gallery(args.probes)
+
+    print(f"Base : {path} ({len(labels)} visages, dimension {embeddings.shape[1]})")
+    rows, gallery_size = evaluate(labels, embeddings, probe_labels, probes, bench_size=args.bench_size)
+    print_report(rows, gallery_size)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+import argparse
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from attendance_utils import FACES_DIR
+from pointage_utils import (
+    EMPLOYES_FILE, SERVICES_FILE, EMPLOYES_COLUMNS, HEURE_ENTREE_DEFAUT, HEURE_SORTIE_DEFAUT, load_data, save_data
+)
+
+COLONNES_OBLIGATOIRES = ["Nom", "Prenom", "Service"]
+EXTENSIONS_PHOTO = (".jpg", ".jpeg", ".png")
+
+def lire_fichier(source, nom_fichier=None):
+    """Lit un fichier CSV ou Excel (chemin ou fichier téléversé) ; toutes les colonnes en texte"""
+    nom_fichier = nom_fichier or getattr(source, "name", str(source))
+    if nom_fichier.lower().endswith((".xlsx", ".xls")):
+        df = pd.read_excel(source, dtype=str)
+    else:
+        df = pd.read_csv(source, dtype=str)
+    df.columns = df.columns.str.strip()
+    return df
+
+def _heures(colonne, defauts):
+    """Normalise une colonne d'heures en HH:MM ; vide → valeur par défaut, invalide → NaN"""
+    valeurs = colonne.fillna("").str.strip()
+    parsees = pd.to_datetime(valeurs, format="%H:%M", errors="coerce").dt.strftime("%H:%M")
+    return parsees.where(valeurs != "", defauts)
+
+def valider(df, services, employes):
+    """Valide toutes les lignes en une passe ; retourne (lignes valides normalisées, rapport d'erreurs)"""
+    manquantes = [c for c in COLONNES_OBLIGATOIRES if c not in df.columns]
+    if manquantes:
+        raise ValueError(f"Colonnes manquantes : {', '.join(manquantes)}")
+
+    if services.empty:
+        raise ValueError("Aucun service défini dans services.csv")
+
+    df = df.copy()
+    for col in COLONNES_OBLIGATOIRES:
+        df[col] = df[col].fillna("").str.strip()
+    df["Ligne"] = df.index + 2  # numéro de ligne dans le fichier, en-tête compris
+
+    # Heures par défaut du service (services.csv), puis heures par défaut de l'application
+    horaires = services.set_index("Nom")
+    entree_defaut = df["Service"].map(horaires["Heure_Entree"]).fillna(HEURE_ENTREE_DEFAUT.strftime("%H:%M"))
+    sortie_defaut = df["Service"].map(horaires["Heure_Sortie"]).fillna(HEURE_SORTIE_DEFAUT.strftime("%H:%M"))
+    df["Heure_Entree"] = _heures(df.get("Heure_Entree", pd.Series("", index=df.index)), entree_defaut)
+    df["Heure_Sortie"] = _heures(df.get("Heure_Sortie", pd.Series("", index=df.index)), sortie_defaut)
+
+    # Clés « prénom nom » pour repérer les doublons dans le fichier et avec les employés existants
+    cle = (df["Prenom"] + " " + df["Nom"]).str.lower()
+    existants = set((employes["Prenom"].astype(str) + " " + employes["Nom"].astype(str)).str.strip().str.lower()) \
+        if not employes.empty else set()
+
+    controles = [
+        ((df["Nom"] == "") | (df["Prenom"] == ""), "Nom ou prénom manquant"),
+        (~df["Service"].isin(services["Nom"]), "Service inconnu"),
+        (df["Heure_Entree"].isna(), "Heure d'entrée invalide (HH:MM)"),
+        (df["Heure_Sortie"].isna(), "Heure de sortie invalide (HH:MM)"),
+        (df["Heure_Entree"] >= df["Heure_Sortie"], "Heure d'entrée après l'heure de sortie"),
+        (cle.duplicated(keep="first"), "Doublon dans le fichier"),
+        (cle.isin(existants), "Employé déjà enregistré")
+    ]
+    erreurs = pd.concat(
+        [df.loc[masque, ["Ligne", "Nom", "Prenom"]].assign(Erreur=message) for masque, message in controles],
+        ignore_index=True
+    ).sort_values("Ligne", kind="stable")
+
+    valides = df[~df["Ligne"].isin(erreurs["Ligne"])]
+    return valides, erreurs.reset_index(drop=True)
+
+def _chercher_photo(photos_dir, ligne):
+    """Photo indiquée dans la colonne Photo, sinon Prenom_Nom.jpg/.jpeg/.png"""
+    photo = ligne.get("Photo")
+    if isinstance(photo, str) and photo.strip():
+        return os.path.join(photos_dir, photo.strip())
+    for ext in EXTENSIONS_PHOTO:
+        path = os.path.join(photos_dir, f"{ligne['Prenom']}_{ligne['Nom']}{ext}")
+        if os.path.exists(path):
+            return path
+    return None
+
+def enregistrer_photo(photos_dir, ligne):
+    """Copie compressée de la photo dans la base des visages ; retourne un message d'erreur ou None"""
+    import cv2
+
+    path = _chercher_photo(photos_dir, ligne)
+    if path is None:
+        return "Photo introuvable"
+    img = cv2.imread(path)
+    if img is None:
+        return f"Photo illisible : {os.path.basename(path)}"
+
+    # Nom de fichier « nom_service.jpg » reconnu par parse_face_filename (app1.py)
+    nom = f"{ligne['Prenom']} {ligne['Nom']}".replace("_", " ")
+    service = ligne["Service"].replace("_", " ")
+    cv2.imwrite(os.path.join(FACES_DIR, f"{nom}_{service}.jpg"), img, [int(cv2.IMWRITE_JPEG_QUALITY), 80])
+    return None
+
+def importer_employes(source, nom_fichier=None, photos_dir=None, workers=8):
+    """Importe un fichier d'employés en une seule écriture ; retourne (employés ajoutés, rapport d'erreurs)"""
+    df = lire_fichier(source, nom_fichier)
+    services = load_data(SERVICES_FILE)
+    employes = load_data(EMPLOYES_FILE)
+    valides, erreurs = valider(df, services, employes)
+
+    # Bloc d'identifiants contigus après le plus grand ID existant
+    premier_id = int(employes["ID"].max()) + 1 if not employes.empty else 1
+    ajoutes = valides.assign(ID=range(premier_id, premier_id + len(valides)))[EMPLOYES_COLUMNS + ["Ligne"]]
+
+    if not ajoutes.empty:
+        save_data(pd.concat([employes, ajoutes[EMPLOYES_COLUMNS]], ignore_index=True), EMPLOYES_FILE)
+
+    if photos_dir and not ajoutes.empty:
+        os.makedirs(FACES_DIR, exist_ok=True)
+        lignes = valides.to_dict("records")
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            resultats = list(executor.map(lambda l: enregistrer_photo(photos_dir, l), lignes))
+        erreurs_photo = pd.DataFrame(
+            [{"Ligne": l["Ligne"], "Nom": l["Nom"], "Prenom": l["Prenom"], "Erreur": f"{r} (employé importé)"}
+             for l, r in zip(lignes, resultats) if r]
+        )
+        if not erreurs_photo.empty:
+            erreurs = pd.concat([erreurs, erreurs_photo], ignore_index=True).sort_values("Ligne", kind="stable")
+
+    return ajoutes.drop(columns="Ligne"), erreurs.reset_index(drop=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="Import en masse des employés depuis un fichier CSV ou Excel")
+    parser.add_argument("fichier", help="Fichier CSV/Excel avec les colonnes Nom, Prenom, Service "
+                                        "(et optionnellement Heure_Entree, Heure_Sortie, Photo)")
+    parser.add_argument("--photos", help="Dossier des photos à enregistrer dans la base des visages")
+    parser.add_argument("--rapport", help="Fichier CSV où écrire le rapport d'erreurs")
+    args = parser.parse_args()
+
+    ajoutes, erreurs = importer_employes(args.fichier, photos_dir=args.photos)
+    print(f"{len(ajoutes)} employés importés, {len(erreurs)} erreurs")
+    if not erreurs.empty:
+        if args.rapport:
+            erreurs.to_csv(args.rapport, index=False, encoding='utf-8')
+        else:
+            print(erreurs.to_string(index=False))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+import os
+import csv
+import numpy as np
+import pandas as pd
+from contextlib import contextmanager
+from datetime import datetime, time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Chemins des fichiers
+EMPLOYES_FILE = "employes.csv"
+POINTAGE_FILE = "pointage.csv"
+RETARDS_FILE = "retards.csv"
+SERVICES_FILE = "services.csv"
+
+EMPLOYES_COLUMNS = ["ID", "Nom", "Prenom", "Service", "Heure_Entree", "Heure_Sortie"]
+POINTAGE_COLUMNS = ["ID", "Nom", "Prenom", "Service", "Type", "Heure", "Date"]
+RETARDS_COLUMNS = ["ID", "Nom", "Prenom", "Service", "Heure_Arrivee", "Heure_Officielle", "Retard_min", "Date"]
+
+# Heures par défaut
+HEURE_ENTREE_DEFAUT = time(8, 0)  # 8h00
+HEURE_SORTIE_DEFAUT = time(17, 0)  # 17h00
+SEUIL_RETARD = 15  # minutes
+
+# Charger les données
+def load_data(filename):
+    try:
+        return pd.read_csv(filename)
+    except:
+        return pd.DataFrame()
+
+# Sauvegarder les données
+def save_data(df, filename):
+    df.to_csv(filename, index=False, encoding='utf-8')
+
+# Convertir string en time
+def str_to_time(time_str):
+    try:
+        return datetime.strptime(time_str, "%H:%M").time()
+    except:
+        return HEURE_ENTREE_DEFAUT
+
+# Types compacts pour les données chargées : IDs int32, textes répétés en catégories,
+# dates en datetime64 et heures en minutes depuis minuit (int16)
+TIME_COLUMNS = ["Heure", "Heure_Entree", "Heure_Sortie", "Heure_Arrivee", "Heure_Officielle"]
+CATEGORY_COLUMNS = ["Nom", "Prenom", "Service", "Type"]
+INT_COLUMNS = {"ID": "int32", "Retard_min": "int32"}
+
+# Convertir une colonne HH:MM en minutes depuis minuit (mêmes valeurs acceptées et même repli que str_to_time)
+def time_to_minutes(series):
+    # Au plus 1440 heures distinctes : on ne convertit que les valeurs uniques
+    codes, uniques = pd.factorize(series)
+    parts = pd.Series(uniques, dtype=str).str.extract(r"^(\d{1,2}):(\d{1,2})$").astype(float)
+    heures, mins = parts[0], parts[1]
+    minutes = (heures * 60 + mins).where((heures < 24) & (mins < 60))
+    defaut = HEURE_ENTREE_DEFAUT.hour * 60 + HEURE_ENTREE_DEFAUT.minute
+    minutes = np.append(minutes.fillna(defaut).to_numpy(), defaut).astype("int16")
+    return pd.Series(minutes[codes], index=series.index)
+
+# Convertir des minutes depuis minuit en texte HH:MM
+def minutes_to_str(series):
+    return (series // 60).astype(str).str.zfill(2) + ":" + (series % 60).astype(str).str.zfill(2)
+
+# Charger les données avec des types compacts, en ne lisant que les colonnes demandées
+def load_typed(filename, columns=None):
+    try:
+        header = pd.read_csv(filename, nrows=0).columns
+    except:
+        return pd.DataFrame(columns=columns)
+    usecols = [c for c in header if columns is None or c in columns]
+    dtype = {c: "category" for c in CATEGORY_COLUMNS if c in usecols}
+    dtype.update({c: str for c in TIME_COLUMNS + ["Date"] if c in usecols})
+    
+    df = pd.read_csv(filename, usecols=usecols, dtype=dtype)
+    for col, type_int in INT_COLUMNS.items():
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0).astype(type_int)
+    for col in TIME_COLUMNS:
+        if col in df.columns:
+            df[col] = time_to_minutes(df[col])
+    if "Date" in df.columns:
+        df["Date"] = pd.to_datetime(df["Date"], format="%Y-%m-%d", errors="coerce")
+    return df
+
+# Remettre les colonnes typées au format texte des fichiers, pour l'affichage
+def to_display(df):
+    df = df.copy()
+    for col in TIME_COLUMNS:
+        if col in df.columns:
+            df[col] = minutes_to_str(df[col])
+    if "Date" in df.columns:
+        df["Date"] = df["Date"].dt.strftime("%Y-%m-%d")
+    return df
+
+# Verrou exclusif entre processus (sessions Streamlit, API, scripts) sur un fichier de données,
+# porté par '<fichier>.lock' : le fichier lui-même peut être remplacé (compaction, reconstruction)
+@contextmanager
+def file_lock(filename):
+    with open(filename + ".lock", "a+") as f:
+        if fcntl:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+# Ajouter des lignes (dictionnaires) en fin de fichier, dans l'ordre des colonnes de son en-tête
+def append_rows(rows, filename, columns):
+    # Sous le verrou du fichier : une compaction ne peut pas remplacer le fichier pendant l'ajout
+    with file_lock(filename):
+        _append_rows(rows, filename, columns)
+
+def _append_rows(rows, filename, columns):
+    if os.path.exists(filename) and os.path.getsize(filename) > 0:
+        with open(filename, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            newline = f.read(1) not in (b"\n", b"\r")
+        with open(filename, newline='', encoding='utf-8') as f:
+            columns = next(csv.reader(f))
+        with open(filename, 'a', newline='', encoding='utf-8') as f:
+            if newline:
+                f.write("\n")
+            csv.DictWriter(f, fieldnames=columns, extrasaction='ignore', lineterminator="\n").writerows(rows)
+    else:
+        with open(filename, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=columns, extrasaction='ignore', lineterminator="\n")
+            writer.writeheader()
+            writer.writerows(rows)
+
+# Enregistrer un pointage (et le retard éventuel) pour un employé
+def enregistrer_pointage(id_employe, type_pointage, employes=None, now=None):
+    import aggregats
+
+    if employes is None:
+        employes = load_data(EMPLOYES_FILE)
+    selection = employes[employes["ID"] == id_employe]
+    if selection.empty:
+        raise KeyError(f"Employé introuvable : {id_employe}")
+    employe = selection.iloc[0]
+    
+    now = now or datetime.now()
+    heure_actuelle = now.time()
+    date_actuelle = now.date()
+    
+    pointage = {"ID": int(id_employe), "Nom": employe["Nom"], "Prenom": employe["Prenom"], "Service": employe["Service"],
+                "Type": type_pointage, "Heure": heure_actuelle.strftime("%H:%M"), "Date": date_actuelle.strftime("%Y-%m-%d")}
+    
+    # Vérification des retards pour l'arrivée
+    retard_enregistre = None
+    heure_officielle = str_to_time(employe["Heure_Entree"])
+    if type_pointage == "Entrée":
+        retard = (datetime.combine(date_actuelle, heure_actuelle) - 
+                datetime.combine(date_actuelle, heure_officielle)).total_seconds() / 60
+        if retard > SEUIL_RETARD:
+            retard_enregistre = round(retard)
+    
+    # Historique et agrégats mis à jour sous le verrou des agrégats : une reconstruction
+    # ne peut pas compter ce pointage dans pointage.csv puis le voir ajouté une seconde fois
+    with aggregats.verrou():
+        # Agrégats calculés depuis l'historique existant avant le premier pointage de cette installation
+        aggregats._initialiser()
+        
+        # Enregistrement du pointage, ajouté en fin de fichier sans réécrire l'historique
+        append_rows([pointage], POINTAGE_FILE, POINTAGE_COLUMNS)
+        if retard_enregistre is not None:
+            append_rows([{**pointage, "Heure_Arrivee": pointage["Heure"], "Heure_Officielle": heure_officielle.strftime("%H:%M"),
+                          "Retard_min": retard_enregistre}], RETARDS_FILE, RETARDS_COLUMNS)
+        
+        aggregats._ajouter_pointage(id_employe, employe["Service"], date_actuelle.strftime("%Y-%m-%d"),
+                                    type_pointage, retard_enregistre)
+    
+    return {**pointage, "Retard_min": retard_enregistre}
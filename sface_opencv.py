@@ -0,0 +1,88 @@
+import os
+import threading
+import urllib.request
+
+import cv2
+import numpy as np
+
+from embedding_quantization import quantize_embeddings, gallery_distances
+
+# Modèles ONNX de l'OpenCV Zoo ; SFace est le même fichier que celui utilisé par DeepFace
+MODELS_DIR = "models"
+DEEPFACE_WEIGHTS_DIR = os.path.join(os.path.expanduser("~"), ".deepface", "weights")
+YUNET_FILE = "face_detection_yunet_2023mar.onnx"
+SFACE_FILE = "face_recognition_sface_2021dec.onnx"
+MODEL_URLS = {
+    YUNET_FILE: "https://github.com/opencv/opencv_zoo/raw/main/models/face_detection_yunet/face_detection_yunet_2023mar.onnx",
+    SFACE_FILE: "https://github.com/opencv/opencv_zoo/raw/main/models/face_recognition_sface/face_recognition_sface_2021dec.onnx"
+}
+
+SCORE_THRESHOLD = 0.7  # confiance minimale du détecteur YuNet
+
+def model_path(filename):
+    """Retourne le chemin du modèle, en réutilisant les poids de DeepFace ou en le téléchargeant"""
+    for directory in (MODELS_DIR, DEEPFACE_WEIGHTS_DIR):
+        path = os.path.join(directory, filename)
+        if os.path.exists(path):
+            return path
+
+    os.makedirs(MODELS_DIR, exist_ok=True)
+    path = os.path.join(MODELS_DIR, filename)
+    # Téléchargement dans un fichier temporaire pour ne jamais laisser un modèle tronqué
+    urllib.request.urlretrieve(MODEL_URLS[filename], path + ".part")
+    os.replace(path + ".part", path)
+    return path
+
+def load_models():
+    """Charge le détecteur YuNet et le modèle SFace via le module DNN d'OpenCV"""
+    return {
+        "detector": cv2.FaceDetectorYN.create(model_path(YUNET_FILE), "", (320, 320), SCORE_THRESHOLD),
+        "recognizer": cv2.FaceRecognizerSF.create(model_path(SFACE_FILE), ""),
+        # Les réseaux OpenCV ne sont pas réentrants ; Streamlit exécute les sessions dans des threads
+        "lock": threading.Lock()
+    }
+
+def get_embedding(models, img_bgr):
+    """Détecte le visage principal d'une image BGR et retourne son embedding SFace (128 float32)"""
+    h, w = img_bgr.shape[:2]
+    with models["lock"]:
+        models["detector"].setInputSize((w, h))
+        _, faces = models["detector"].detect(img_bgr)
+        if faces is None or len(faces) == 0:
+            return None
+
+        # Visage le plus probable, aligné sur ses points de repère comme l'attend SFace
+        face = faces[np.argmax(faces[:, -1])]
+        aligned = models["recognizer"].alignCrop(img_bgr, face)
+        embedding = models["recognizer"].feature(aligned)
+    return embedding.ravel().astype(np.float32)
+
+def build_gallery(models, faces_dir, face_files, mode="float32"):
+    """Calcule les embeddings des visages enregistrés et retourne (fichiers, galerie)"""
+    labels, embeddings = [], []
+    for face_file in face_files:
+        img = cv2.imread(os.path.join(faces_dir, face_file))
+        if img is None:
+            continue
+        embedding = get_embedding(models, img)
+        if embedding is not None:
+            labels.append(face_file)
+            embeddings.append(embedding)
+
+    if not embeddings:
+        return labels, None
+    return labels, quantize_embeddings(np.vstack(embeddings), mode)
+
+def recognize(models, labels, gallery, img_bgr, threshold):
+    """Retourne (fichier, distance cosinus) du visage le plus proche sous le seuil, sinon (None, None)"""
+    if gallery is None:
+        return None, None
+    embedding = get_embedding(models, img_bgr)
+    if embedding is None:
+        return None, None
+
+    distances = gallery_distances(gallery, embedding, "cosine")
+    best = int(np.argmin(distances))
+    if distances[best] < threshold:
+        return labels[best], float(distances[best])
+    return None, None
@@ -0,0 +1,78 @@
+import argparse
+import csv
+import os
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+# Modules lourds dont on vérifie qu'ils ne sont pas importés au démarrage
+HEAVY_MODULES = ["deepface", "tensorflow", "cv2", "PIL", "face_recognition"]
+
+def parse_importtime(stderr):
+    """Retourne {module: (propre_us, cumulé_us, profondeur)} depuis la sortie de python -X importtime"""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue  # ligne d'en-tête
+        raw_name = parts[2]
+        depth = (len(raw_name) - len(raw_name.lstrip()) - 1) // 2
+        modules[raw_name.strip()] = (int(parts[0]), int(parts[1]), depth)
+    return modules
+
+def measure_script(script):
+    """Exécute le script en mode nu (sans serveur Streamlit) et mesure ses imports"""
+    code = f"import runpy; runpy.run_path({script!r}, run_name='__main__')"
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                            capture_output=True, text=True, env=env)
+    wall = time.perf_counter() - start
+    return parse_importtime(result.stderr), wall, result.returncode
+
+def print_report(script, modules, wall, top=15):
+    """Affiche les imports de premier niveau les plus coûteux"""
+    roots = sorted(((name, cumul) for name, (_, cumul, depth) in modules.items() if depth == 0),
+                   key=lambda x: x[1], reverse=True)
+    total = sum(cumul for _, cumul in roots)
+
+    print(f"Démarrage de {script} : {wall * 1000:.0f} ms au total, dont {total / 1000:.0f} ms d'imports")
+    print(f"{'module':<30} {'cumulé (ms)':>12} {'part':>6}")
+    for name, cumul in roots[:top]:
+        print(f"{name:<30} {cumul / 1000:>12.1f} {cumul / total if total else 0:>6.1%}")
+
+    loaded = [m for m in HEAVY_MODULES if m in modules]
+    print(f"Modules lourds importés au démarrage : {', '.join(loaded) if loaded else 'aucun'}")
+    return total
+
+def append_history(path, script, total_us, wall):
+    """Ajoute la mesure au fichier d'historique pour suivre l'évolution du temps de démarrage"""
+    exists = os.path.exists(path)
+    with open(path, 'a', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        if not exists:
+            writer.writerow(["Date", "Script", "Imports_ms", "Total_ms"])
+        writer.writerow([datetime.now().strftime("%Y-%m-%d %H:%M:%S"), script,
+                         round(total_us / 1000), round(wall * 1000)])
+
+def main():
+    parser = argparse.ArgumentParser(description="Rapport du temps d'import au démarrage des applications")
+    parser.add_argument("scripts", nargs="*", default=["app1.py"], help="Scripts Streamlit à mesurer")
+    parser.add_argument("--top", type=int, default=15, help="Nombre de modules affichés")
+    parser.add_argument("--history", help="Fichier CSV où ajouter les mesures")
+    args = parser.parse_args()
+
+    for script in args.scripts:
+        modules, wall, returncode = measure_script(script)
+        if returncode != 0:
+            print(f"Attention : {script} s'est terminé avec le code {returncode}", file=sys.stderr)
+        total = print_report(script, modules, wall, args.top)
+        if args.history:
+            append_history(args.history, script, total, wall)
+        print()
+
+if __name__ == "__main__":
+    main()